@@ -3,6 +3,18 @@
 set -e
 
 # Run this script from within a booted SystemRescue
+#
+#   sh build.sh                  full build, every layer is rebuilt
+#   sh build.sh --incremental    only rebuild the layers whose inputs changed since the last build
+#
+# Each layer (airootfs.sfs, ACAS.srm) is kept in $BUILD_CACHE_DIR with a manifest of its inputs: the
+# package lists, and for airootfs.sfs also this script and every file under airootfs/ and modules/.
+# An incremental build compares the manifests and drops the cached layer in when nothing changed,
+# so a change to modules/NessusAPI only repacks airootfs.sfs and the ISO. The cache also holds the
+# unpacked airootfs with the package removals already done, pacman packages, pip wheels and downloads.
+# Edits to the Pacman SRM section of this script are not tracked, run a full build after those.
+# airootfs is built on an overlay of the cached base, so the base takes the place of the unpacked
+# copy a full build used to hold in RAM. With BUILD_CACHE_DIR on a disk it doesn't take RAM at all.
 
 # Set environment vars first. Note that we can't make these anything -- best to stick to tmpfs
 TEMP_USR=makepkguser
@@ -11,6 +23,9 @@ SYSRESCUE_EXTRACT_DIR=/tmp/sysrescue/extracted
 SYSRESCUE_DIR=$(dirname "$SYSRESCUE_EXTRACT_DIR")
 AIROOTFS_UNPACK_DIR=/tmp/airootfs_unpacked
 PACKAGE_DIR=/tmp/packages
+# point this at a disk to keep the cache across reboots of the build VM
+BUILD_CACHE_DIR="${BUILD_CACHE_DIR:-/tmp/build-cache}"
+BUILD_SCRIPT="$(readlink -f "$0")"
 
 ISO_NAME="ACASLive.iso"
 
@@ -27,6 +42,7 @@ PACMAN_PKGS="git \
             jdk-openjdk \
             python-pyserial \
             expect \
+            sshpass \
             zenity \
             nmap"
 
@@ -51,67 +67,163 @@ PACMAN_PKGS_TO_REMOVE="timeshift \
 #                       remmina" # add this line to remove VNC viewing capability
 # NOTE: we removed featherpad to install lite-xl below
 
+INCREMENTAL=0
+case "$1" in
+    -i|--incremental) INCREMENTAL=1 ;;
+    "") ;;
+    *) echo "Usage: $0 [--incremental]"; exit 1 ;;
+esac
+
 #### Note: we cannot remove avahi, but we can disable the service. this will cause us to lose samba, but whatever
 ####       look for the line below: `ln -s /dev/null /etc/systemd/system/avahi-daemon.service`
 
 #####################################################
-#                Unpack SysRescue                   #
+#                 Build Helpers                     #
 #####################################################
 
-# unpack the airootfs SRM
-mkdir -p "$SYSRESCUE_EXTRACT_DIR"
-cd "$SYSRESCUE_DIR"
-sysrescue-customize --unpack --source=/dev/sr0 --dest="$SYSRESCUE_EXTRACT_DIR"
-mkdir -p "$AIROOTFS_UNPACK_DIR"
-unsquashfs -d "$AIROOTFS_UNPACK_DIR" "$SYSRESCUE_EXTRACT_DIR/filesystem/sysresccd/x86_64/airootfs.sfs"
-
-# move the build files from /tmp into the extracted srm
-mv /tmp/airootfs "$AIROOTFS_UNPACK_DIR/tmp/airootfs"
-mv /tmp/modules "$AIROOTFS_UNPACK_DIR/tmp/opt"
+# wall clock time of each stage, printed at the end
+STAGE_TIMES=""
+STAGE_NAME=""
+BUILD_START=$(date +%s)
+STAGE_START=$BUILD_START
+
+stage() {
+    now=$(date +%s)
+    if [ -n "$STAGE_NAME" ]; then
+        STAGE_TIMES="$STAGE_TIMES$(printf '%-34s %6ss' "$STAGE_NAME" $((now - STAGE_START)))
+"
+    fi
+    STAGE_NAME="$1"
+    STAGE_START=$now
+    if [ -n "$1" ]; then
+        echo "==> $1"
+    fi
+}
 
-#####################################################
-#               Customize airootfs                  #
-#####################################################
+# succeeds when layer $1 has to be rebuilt: a full build, no cached layer, or a changed input.
+# inputs are the package list in $2 and the files under the paths that follow. the new manifest only
+# replaces the cached one in commit_layer, after the layer is built
+layer_changed() {
+    layer="$1"
+    packages="$2"
+    shift 2
+    {
+        echo "packages: $packages" | tr -s ' '
+        if [ $# -gt 0 ]; then
+            find "$@" -name __pycache__ -prune -o -type f -print0 | sort -z | xargs -0 -r sha256sum
+        fi
+    } > "$BUILD_CACHE_DIR/$layer.manifest.new"
+    if [ "$INCREMENTAL" = 1 ] && [ -e "$BUILD_CACHE_DIR/$layer" ] && [ -f "$BUILD_CACHE_DIR/$layer.manifest" ]; then
+        if cmp -s "$BUILD_CACHE_DIR/$layer.manifest" "$BUILD_CACHE_DIR/$layer.manifest.new"; then
+            return 1
+        fi
+        echo "$layer inputs changed:"
+        diff "$BUILD_CACHE_DIR/$layer.manifest" "$BUILD_CACHE_DIR/$layer.manifest.new" | grep '^>' | cut -c3- | head -n 20 || true
+    fi
+    return 0
+}
 
-# Change dirs instead of chroot due to issues. We'll relatively reference this path the entire time
-cd "$AIROOTFS_UNPACK_DIR"
+commit_layer() {
+    mv -f "$BUILD_CACHE_DIR/$1.manifest.new" "$BUILD_CACHE_DIR/$1.manifest"
+    ISO_STALE=1
+}
 
-# remove pacman packages
-chroot "$AIROOTFS_UNPACK_DIR" pacman --noconfirm -R $PACMAN_PKGS_TO_REMOVE
+# put a cached layer into the extracted ISO tree, hard linked when the cache is on the same filesystem
+install_layer() {
+    ln -f "$1" "$2" 2>/dev/null || cp -f "$1" "$2"
+}
 
-# update firefox policies
-mv ./tmp/airootfs/firefox_policies.json ./opt/firefox-esr/distribution/policies.json
+mkdir -p "$BUILD_CACHE_DIR/pacman" "$BUILD_CACHE_DIR/pip" "$BUILD_CACHE_DIR/sources" "$BUILD_CACHE_DIR/downloads"
+ISO_STALE=0
+if [ "$INCREMENTAL" = 0 ]; then
+    ISO_STALE=1
+fi
 
-# set XFCE configurations for root (dark mode and panel)
-rm -rf ./root/.config
-tar -zxvf "./tmp/airootfs/config.tar.gz" -C ./root/
+#####################################################
+#                Unpack SysRescue                   #
+#####################################################
 
-# remove the firewall (done in YAML defaults below)
-# rm -f ./etc/systemd/system/multi-user.target.wants/iptables.service
-# rm -f ./etc/systemd/system/multi-user.target.wants/ip6tables.service
+stage "Unpack SystemRescue"
+# the unpacked airootfs with the packages removed is the base every airootfs build starts from. it is
+# rebuilt from a fresh unpack of the ISO since the extracted airootfs.sfs gets replaced by our own
+if layer_changed airootfs-base "$PACMAN_PKGS_TO_REMOVE"; then
+    BUILD_BASE=1
+    rm -rf "${SYSRESCUE_EXTRACT_DIR:?}"
+else
+    BUILD_BASE=0
+fi
+
+if [ ! -d "$SYSRESCUE_EXTRACT_DIR/filesystem" ]; then
+    # unpack the airootfs SRM
+    rm -rf "${SYSRESCUE_EXTRACT_DIR:?}"
+    mkdir -p "$SYSRESCUE_EXTRACT_DIR"
+    cd "$SYSRESCUE_DIR"
+    sysrescue-customize --unpack --source=/dev/sr0 --dest="$SYSRESCUE_EXTRACT_DIR"
+    ISO_STALE=1
+fi
+
+if [ "$BUILD_BASE" = 1 ]; then
+    stage "Unpack airootfs and remove packages"
+    rm -rf "${BUILD_CACHE_DIR:?}/airootfs-base"
+    unsquashfs -d "$BUILD_CACHE_DIR/airootfs-base" "$SYSRESCUE_EXTRACT_DIR/filesystem/sysresccd/x86_64/airootfs.sfs"
+
+    # remove pacman packages
+    chroot "$BUILD_CACHE_DIR/airootfs-base" pacman --noconfirm -R $PACMAN_PKGS_TO_REMOVE
+    commit_layer airootfs-base
+fi
 
-# disable avahi
-rm -f ./etc/systemd/system/avahi-daemon.service
-ln -s /dev/null ./etc/systemd/system/avahi-daemon.service
+#####################################################
+#               Customize airootfs                  #
+#####################################################
 
-# modify hosts file and hostname (can also be done in yaml but i want it here)
-cat > "./etc/hosts" <<EOF
+if layer_changed airootfs.sfs "$PACMAN_PKGS_TO_REMOVE" "$BUILD_SCRIPT" /tmp/airootfs /tmp/modules; then
+    stage "Customize airootfs"
+    # build on an overlay of the cached base, so the base stays untouched and only the files the
+    # customizations change take up more space. the build files are copied from /tmp into it, the
+    # originals stay for the next build's manifest
+    umount "$AIROOTFS_UNPACK_DIR" 2>/dev/null || true
+    rm -rf "${AIROOTFS_UNPACK_DIR:?}" "${AIROOTFS_UNPACK_DIR:?}.upper" "${AIROOTFS_UNPACK_DIR:?}.work"
+    mkdir -p "$AIROOTFS_UNPACK_DIR" "$AIROOTFS_UNPACK_DIR.upper" "$AIROOTFS_UNPACK_DIR.work"
+    mount -t overlay overlay -o "lowerdir=$BUILD_CACHE_DIR/airootfs-base,upperdir=$AIROOTFS_UNPACK_DIR.upper,workdir=$AIROOTFS_UNPACK_DIR.work" "$AIROOTFS_UNPACK_DIR"
+    cp -a /tmp/airootfs "$AIROOTFS_UNPACK_DIR/tmp/airootfs"
+    cp -a /tmp/modules "$AIROOTFS_UNPACK_DIR/tmp/opt"
+
+    # Change dirs instead of chroot due to issues. We'll relatively reference this path the entire time
+    cd "$AIROOTFS_UNPACK_DIR"
+
+    # update firefox policies
+    mv ./tmp/airootfs/firefox_policies.json ./opt/firefox-esr/distribution/policies.json
+
+    # set XFCE configurations for root (dark mode and panel)
+    rm -rf ./root/.config
+    tar -zxvf "./tmp/airootfs/config.tar.gz" -C ./root/
+
+    # remove the firewall (done in YAML defaults below)
+    # rm -f ./etc/systemd/system/multi-user.target.wants/iptables.service
+    # rm -f ./etc/systemd/system/multi-user.target.wants/ip6tables.service
+
+    # disable avahi
+    rm -f ./etc/systemd/system/avahi-daemon.service
+    ln -s /dev/null ./etc/systemd/system/avahi-daemon.service
+
+    # modify hosts file and hostname (can also be done in yaml but i want it here)
+    cat > "./etc/hosts" <<EOF
 127.0.0.1   localhost acas acasvm acaslive sysrescue
 ::1         localhost acas acasvm acaslive sysrescue
 EOF
 
-echo 'acas' > "./etc/hostname"
+    echo 'acas' > "./etc/hostname"
 
-# modify "$AIROOTFS_UNPACK_DIR/root/.bashrc"
-echo 'alias l="ls"' >> ./root/.bashrc
-echo 'alias la="ls -la"' >> ./root/.bashrc
-echo 'alias activate="source /root/.venv/bin/activate"' >> ./root/.bashrc
-echo 'alias activate="source /root/.venv/bin/activate"' >> ./root/.bashrc
-echo 'alias serial_9600="picocom -b 9600 -y n -d 8 -p 1 /dev/ttyS0"' >> ./root/.bashrc
-echo 'alias serial_115200="picocom -b 115200 -y n -d 8 -p 1 /dev/ttyS0"' >> ./root/.bashrc
-echo 'alias serialusb_9600="picocom -b 9600 -y n -d 8 -p 1 /dev/ttyUSB0"' >> ./root/.bashrc
-echo 'alias serialusb_115200="picocom -b 115200 -y n -d 8 -p 1 /dev/ttyUSB0"' >> ./root/.bashrc
-cat >> ./root/.bashrc <<EOF
+    # modify "$AIROOTFS_UNPACK_DIR/root/.bashrc"
+    echo 'alias l="ls"' >> ./root/.bashrc
+    echo 'alias la="ls -la"' >> ./root/.bashrc
+    echo 'alias activate="source /root/.venv/bin/activate"' >> ./root/.bashrc
+    echo 'alias activate="source /root/.venv/bin/activate"' >> ./root/.bashrc
+    echo 'alias serial_9600="picocom -b 9600 -y n -d 8 -p 1 /dev/ttyS0"' >> ./root/.bashrc
+    echo 'alias serial_115200="picocom -b 115200 -y n -d 8 -p 1 /dev/ttyS0"' >> ./root/.bashrc
+    echo 'alias serialusb_9600="picocom -b 9600 -y n -d 8 -p 1 /dev/ttyUSB0"' >> ./root/.bashrc
+    echo 'alias serialusb_115200="picocom -b 115200 -y n -d 8 -p 1 /dev/ttyUSB0"' >> ./root/.bashrc
+    cat >> ./root/.bashrc <<EOF
 
 function https-server() {
     ip="0.0.0.0"
@@ -135,69 +247,84 @@ function http-server() {
 
 EOF
 
-#### setup firstrun script & service
-mv ./tmp/airootfs/nessus_reconfigure.sh ./usr/local/bin/nessus_reconfigure.sh
-chmod 744 ./usr/local/bin/nessus_reconfigure.sh
-mv ./tmp/airootfs/firstrun.service ./usr/lib/systemd/system/firstrun.service
-ln -s /usr/lib/systemd/system/firstrun.service ./etc/systemd/system/multi-user.target.wants/firstrun.service
-
-################## Add NessusAPI ##################
-
-mv ./tmp/opt/NessusAPI ./opt/
-
-# we have to install venv since pytenable is not an arch-native package
-python -m venv ./root/.venv
-source ./root/.venv/bin/activate
-# python -m pip install --upgrade pip
-pip install pytenable
-deactivate
-
-echo 'alias nessus-configure="/root/.venv/bin/python /opt/NessusAPI/nessus-configure.py"' >> ./root/.bashrc
-echo 'alias nessus-policy-update="/root/.venv/bin/python /opt/NessusAPI/nessus-policy-update.py"' >> ./root/.bashrc
-
-########## Add Networkctl + Helper Scripts ##########
-
-mv ./tmp/opt/TenableCore/scripts/bin ./opt/scripts
-mv ./tmp/opt/TenableCore/NetworkManager/*.nmconnection ./etc/NetworkManager/system-connections/
-chmod 600 ./etc/NetworkManager/system-connections/*.nmconnection
-
-for file in $(ls -1 ./opt/scripts/ | grep \.sh) ; do
-    chmod 755 "./opt/scripts/$file"
-    # since networkctl exists on archlinux, we leave the '.sh extension'
-    ln -s "/opt/scripts/$file" "./usr/bin/$file"
-done
-
-################### Add Lite-XL IDE ###################
-
-wget https://github.com/lite-xl/lite-xl/releases/download/v2.1.7/lite-xl-v2.1.7-addons-linux-x86_64-portable.tar.gz -O ./opt/litexl.tgz
-tar -zxvf ./opt/litexl.tgz -C ./opt
-rm ./opt/litexl.tgz
-# note that the config tar archive relies on this being present
-
-################ Add Notes/Procedures ################
-mkdir -p ./root/Desktop/
-mv ./tmp/opt/Notes ./root/Desktop/Procedures
-
-################################## ***************** ##################################
-################################# TODO: FIX OSD BUILD #################################
-################################## ***************** ##################################
-
-mv ./tmp/opt/oh-switch-disk ./opt/OSD
-chmod 755 ./opt/OSD/*.sh
-
-## cleanup build files from airootfs/tmp
-rm -rf ./tmp/airootfs ./tmp/opt
-
-################## Repack airootfs ##################
-
-cd "$SYSRESCUE_DIR"
-rm "$SYSRESCUE_DIR/extracted/filesystem/sysresccd/x86_64/airootfs.sfs"
-mksquashfs "$AIROOTFS_UNPACK_DIR" "$SYSRESCUE_DIR/extracted/filesystem/sysresccd/x86_64/airootfs.sfs"
+    #### setup firstrun script & service
+    mv ./tmp/airootfs/nessus_reconfigure.sh ./usr/local/bin/nessus_reconfigure.sh
+    chmod 744 ./usr/local/bin/nessus_reconfigure.sh
+    mv ./tmp/airootfs/firstrun.service ./usr/lib/systemd/system/firstrun.service
+    ln -s /usr/lib/systemd/system/firstrun.service ./etc/systemd/system/multi-user.target.wants/firstrun.service
+
+    ################## Add NessusAPI ##################
+
+    mv ./tmp/opt/NessusAPI ./opt/
+
+    # we have to install venv since pytenable is not an arch-native package
+    python -m venv ./root/.venv
+    source ./root/.venv/bin/activate
+    # python -m pip install --upgrade pip
+    pip install --cache-dir "$BUILD_CACHE_DIR/pip" pytenable pyinstaller
+    # frozen single-file builds start faster off the squashfs than the venv scripts
+    sh ./opt/NessusAPI/freeze.sh ./opt/NessusAPI/dist
+    pip uninstall -y pyinstaller
+    deactivate
+
+    echo 'alias nessus-configure="/opt/NessusAPI/dist/nessus-configure"' >> ./root/.bashrc
+    echo 'alias nessus-policy-update="/opt/NessusAPI/dist/nessus-policy-update"' >> ./root/.bashrc
+
+    ########## Add Networkctl + Helper Scripts ##########
+
+    mv ./tmp/opt/TenableCore/scripts/bin ./opt/scripts
+    mv ./tmp/opt/TenableCore/NetworkManager/*.nmconnection ./etc/NetworkManager/system-connections/
+    chmod 600 ./etc/NetworkManager/system-connections/*.nmconnection
+
+    for file in $(ls -1 ./opt/scripts/ | grep \.sh) ; do
+        chmod 755 "./opt/scripts/$file"
+        # since networkctl exists on archlinux, we leave the '.sh extension'
+        ln -s "/opt/scripts/$file" "./usr/bin/$file"
+    done
+
+    ################### Add Lite-XL IDE ###################
+
+    LITEXL_TGZ="$BUILD_CACHE_DIR/downloads/lite-xl-v2.1.7-addons-linux-x86_64-portable.tar.gz"
+    if [ ! -f "$LITEXL_TGZ" ]; then
+        wget https://github.com/lite-xl/lite-xl/releases/download/v2.1.7/lite-xl-v2.1.7-addons-linux-x86_64-portable.tar.gz -O "$LITEXL_TGZ.part"
+        mv "$LITEXL_TGZ.part" "$LITEXL_TGZ"
+    fi
+    tar -zxvf "$LITEXL_TGZ" -C ./opt
+    # note that the config tar archive relies on this being present
+
+    ################ Add Notes/Procedures ################
+    mkdir -p ./root/Desktop/
+    mv ./tmp/opt/Notes ./root/Desktop/Procedures
+
+    ################################## ***************** ##################################
+    ################################# TODO: FIX OSD BUILD #################################
+    ################################## ***************** ##################################
+
+    mv ./tmp/opt/oh-switch-disk ./opt/OSD
+    chmod 755 ./opt/OSD/*.sh
+
+    ## cleanup build files from airootfs/tmp
+    rm -rf ./tmp/airootfs ./tmp/opt
+
+    ################## Repack airootfs ##################
+
+    stage "Repack airootfs"
+    cd "$SYSRESCUE_DIR"
+    rm -f "$BUILD_CACHE_DIR/airootfs.sfs"
+    mksquashfs "$AIROOTFS_UNPACK_DIR" "$BUILD_CACHE_DIR/airootfs.sfs" -noappend -processors "$(nproc)"
+    umount "$AIROOTFS_UNPACK_DIR"
+    rm -rf "${AIROOTFS_UNPACK_DIR:?}.upper" "${AIROOTFS_UNPACK_DIR:?}.work"
+    commit_layer airootfs.sfs
+else
+    stage "Reuse airootfs.sfs"
+fi
+install_layer "$BUILD_CACHE_DIR/airootfs.sfs" "$SYSRESCUE_EXTRACT_DIR/filesystem/sysresccd/x86_64/airootfs.sfs"
 
 #####################################################
 #               Modify Boot Defaults                #
 #####################################################
 
+stage "Modify boot defaults"
 # modify YAML defaults
 cat >"$SYSRESCUE_EXTRACT_DIR/filesystem/sysrescue.d/100-defaults.yaml" <<EOF
 ---
@@ -223,59 +350,72 @@ EOF
 #                Prepare Pacman SRM                 #
 #####################################################
 
-mkdir -p "$PACKAGE_DIR"
-cd "$PACKAGE_DIR"
-chmod 777 "$PACKAGE_DIR"
-
-# update pacman db & install packages
-pacman --noconfirm -Sy $PACMAN_PKGS
-
-################## Install Nessus ##################
-
-useradd "$TEMP_USR"
-echo "$TEMP_USR ALL=(ALL) NOPASSWD: ALL" > "/etc/sudoers.d/$TEMP_USR"
-
-su "$TEMP_USR" -c "git clone https://aur.archlinux.org/nessus.git"
-cd nessus
-su "$TEMP_USR" -c "echo Y | makepkg -si"
-cd -
-
-rm -f "/etc/sudoers.d/$TEMP_USR"
-userdel "$TEMP_USR"
-
-# prepare the SRM
-cowpacman2srm -s prepare
-
-# customize the SRM
-cd /tmp/srm_content
-mkdir -p ./etc/systemd/system
-ln -s /usr/lib/systemd/system/nessusd.service ./etc/systemd/system/nessusd.service
-
-############# Install Open-Source Tools #############
-cd /tmp/srm_content
-# Privesc scripts
-mkdir -p ./opt/utils/{PEASS-ng,PSpy}
-wget -O ./opt/utils/PEASS-ng/linpeas.sh 'https://github.com/peass-ng/PEASS-ng/releases/download/20241222-e17c35a2/linpeas.sh'
-wget -O ./opt/utils/PEASS-ng/winpeas_x64.exe 'https://github.com/peass-ng/PEASS-ng/releases/download/20241222-e17c35a2/winPEASx64.exe'
-wget -O ./opt/utils/PEASS-ng/winpeas_x86.exe 'https://github.com/peass-ng/PEASS-ng/releases/download/20241222-e17c35a2/winPEASx86.exe'
-wget -O ./opt/utils/PEASS-ng/winpeas.bat 'https://github.com/peass-ng/PEASS-ng/releases/download/20241222-e17c35a2/winPEAS.bat'
-
-# process snooping (PSpy)
-wget -O ./opt/utils/PSpy/pspy32 'https://github.com/DominicBreuker/pspy/releases/download/v1.2.1/pspy32'
-wget -O ./opt/utils/PSpy/pspy64 'https://github.com/DominicBreuker/pspy/releases/download/v1.2.1/pspy64'
-
-# gtfobins/lolbas (unset errors on recursive wget due to perl errors)
-cd ./opt
-set +e
-wget -r https://gtfobins.github.io/ --content-on-error
-wget -r https://lolbas-project.github.io/ --content-on-error
-set -e
-mv gtfobins.github.io GTFOBins
-mv lolbas-project.github.io LOLBAS
-cd /tmp/srm_content
-
-# close the srm and put it with airootfs.sfs
-cowpacman2srm -s create "$SYSRESCUE_EXTRACT_DIR/filesystem/sysresccd/ACAS.srm"
+if layer_changed ACAS.srm "$PACMAN_PKGS"; then
+    stage "Build ACAS.srm"
+    mkdir -p "$PACKAGE_DIR"
+    cd "$PACKAGE_DIR"
+    chmod 777 "$PACKAGE_DIR"
+
+    # update pacman db & install packages
+    pacman --noconfirm --cachedir "$BUILD_CACHE_DIR/pacman" -Sy $PACMAN_PKGS
+
+    ################## Install Nessus ##################
+
+    # a previous build of this session may have stopped before removing the user
+    id "$TEMP_USR" >/dev/null 2>&1 || useradd "$TEMP_USR"
+    echo "$TEMP_USR ALL=(ALL) NOPASSWD: ALL" > "/etc/sudoers.d/$TEMP_USR"
+
+    # the Nessus package download is kept in the cache (SRCDEST)
+    chmod 777 "$BUILD_CACHE_DIR/sources"
+    rm -rf ./nessus
+    su "$TEMP_USR" -c "git clone https://aur.archlinux.org/nessus.git"
+    cd nessus
+    su "$TEMP_USR" -c "echo Y | SRCDEST='$BUILD_CACHE_DIR/sources' makepkg -si"
+    cd -
+
+    rm -f "/etc/sudoers.d/$TEMP_USR"
+    userdel "$TEMP_USR"
+
+    # prepare the SRM, dropping what an earlier build of this session left in /tmp/srm_content
+    rm -rf /tmp/srm_content
+    cowpacman2srm -s prepare
+
+    # customize the SRM
+    cd /tmp/srm_content
+    mkdir -p ./etc/systemd/system
+    ln -s /usr/lib/systemd/system/nessusd.service ./etc/systemd/system/nessusd.service
+
+    ############# Install Open-Source Tools #############
+    cd /tmp/srm_content
+    # Privesc scripts
+    mkdir -p ./opt/utils/{PEASS-ng,PSpy}
+    wget -O ./opt/utils/PEASS-ng/linpeas.sh 'https://github.com/peass-ng/PEASS-ng/releases/download/20241222-e17c35a2/linpeas.sh'
+    wget -O ./opt/utils/PEASS-ng/winpeas_x64.exe 'https://github.com/peass-ng/PEASS-ng/releases/download/20241222-e17c35a2/winPEASx64.exe'
+    wget -O ./opt/utils/PEASS-ng/winpeas_x86.exe 'https://github.com/peass-ng/PEASS-ng/releases/download/20241222-e17c35a2/winPEASx86.exe'
+    wget -O ./opt/utils/PEASS-ng/winpeas.bat 'https://github.com/peass-ng/PEASS-ng/releases/download/20241222-e17c35a2/winPEAS.bat'
+
+    # process snooping (PSpy)
+    wget -O ./opt/utils/PSpy/pspy32 'https://github.com/DominicBreuker/pspy/releases/download/v1.2.1/pspy32'
+    wget -O ./opt/utils/PSpy/pspy64 'https://github.com/DominicBreuker/pspy/releases/download/v1.2.1/pspy64'
+
+    # gtfobins/lolbas (unset errors on recursive wget due to perl errors)
+    cd ./opt
+    set +e
+    wget -r https://gtfobins.github.io/ --content-on-error
+    wget -r https://lolbas-project.github.io/ --content-on-error
+    set -e
+    mv gtfobins.github.io GTFOBins
+    mv lolbas-project.github.io LOLBAS
+    cd /tmp/srm_content
+
+    # close the srm and put it with airootfs.sfs
+    rm -f "$BUILD_CACHE_DIR/ACAS.srm"
+    cowpacman2srm -s create "$BUILD_CACHE_DIR/ACAS.srm"
+    commit_layer ACAS.srm
+else
+    stage "Reuse ACAS.srm"
+fi
+install_layer "$BUILD_CACHE_DIR/ACAS.srm" "$SYSRESCUE_EXTRACT_DIR/filesystem/sysresccd/ACAS.srm"
 
 #####################################################
 #               Repack SystemRescue                 #
@@ -283,11 +423,23 @@ cowpacman2srm -s create "$SYSRESCUE_EXTRACT_DIR/filesystem/sysresccd/ACAS.srm"
 
 cd "$SYSRESCUE_DIR"
 
-sysrescue-customize --rebuild --source="$SYSRESCUE_EXTRACT_DIR" --dest="$SYSRESCUE_DIR/$ISO_NAME"
+if [ "$ISO_STALE" = 1 ] || [ ! -f "$SYSRESCUE_DIR/$ISO_NAME" ]; then
+    stage "Rebuild ISO"
+    rm -f "${SYSRESCUE_DIR:?}/${ISO_NAME:?}"
+    sysrescue-customize --rebuild --source="$SYSRESCUE_EXTRACT_DIR" --dest="$SYSRESCUE_DIR/$ISO_NAME"
+else
+    stage "Reuse ISO"
+fi
+stage ""
 
 echo "System Rescue ISO built to: $SYSRESCUE_DIR/$ISO_NAME"
 echo "Make sure to copy this image back to your host and test it before deploying it to production"
 
+echo
+echo "Stage timings:"
+printf '%s' "$STAGE_TIMES"
+printf '%-34s %6ss\n' "total" $(($(date +%s) - BUILD_START))
+
 cd "$SYSRESCUE_DIR"
 
 exit 0
\ No newline at end of file
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+
+import argparse
+import json
+import os
+import tempfile
+import tracemalloc
+from contextlib import redirect_stdout
+from multiprocessing import get_context
+from multiprocessing.connection import Connection
+from time import perf_counter
+from typing import Callable
+from mockserver import MockNessus, serve
+from nessusapi import NessusAPI
+
+# Throughput benchmark for init/export against the local mock server. For each scale it reports
+# wall time, API requests, bytes served and peak Python heap (tracemalloc) for:
+#   init        first reconcile of a fresh server (policy imports + scan creation)
+#   reinit      reconcile of the same config again (nothing to change)
+#   export      full export of every completed scan
+#   reexport    incremental export of the same scans (nothing to download)
+# The mock server runs in its own process so only the client is measured. Every scale runs twice
+# against a fresh mock: once for the times and request counts, once with tracemalloc on for the peak
+# heap (tracemalloc slows the client down considerably).
+
+POLICY_XML = '''<?xml version="1.0" ?>
+<NessusClientData_v2><Policy><policyName>Benchmark</policyName><Preferences/></Policy></NessusClientData_v2>
+'''
+
+def make_config(directory: str, host: str, port: int, scans: int) -> str:
+    policy_file = os.path.join(directory, 'benchmark-policy.xml')
+    with open(policy_file, 'w') as file:
+        file.write(POLICY_XML)
+    policies = [{
+        'name': f"Benchmark Policy {p}",
+        'file': policy_file,
+        'credentials': {'Host': {'SSH': [{'auth_method': 'password', 'username': f'user{p}', 'password': 'password'}]}},
+    } for p in range(max(1, scans // 10))]
+    config = {
+        'server': {'host': host, 'port': port, 'credentials': {'type': 'password', 'username': 'bench', 'password': 'bench'}},
+        'policies': policies,
+        'scans': [{
+            'name': f"Benchmark Scan {s}",
+            'description': '',
+            'folder': f"Benchmark {s % 5}",
+            'policy': policies[s % len(policies)]['name'],
+            'targets': [f"10.{s // 256 % 256}.{s % 256}.0/24"],
+        } for s in range(scans)],
+    }
+    config_file = os.path.join(directory, 'benchmark-config.json')
+    with open(config_file, 'w') as file:
+        file.write(json.dumps(config, indent=2))
+    return config_file
+
+def run_mock(control: Connection, options: dict) -> None:
+    # mock server process: sends its port, then answers "reset", "stats" and "complete" until "stop"
+    mock = MockNessus(**options)
+    server = serve(mock)
+    control.send(server.server_address[1])
+    while True:
+        command = control.recv()
+        if command == 'reset':
+            mock.reset_stats()
+        elif command == 'complete':
+            mock.complete_all()
+        elif command == 'stats':
+            control.send((sum(mock.requests.values()), mock.bytes_sent))
+            continue
+        else:
+            break
+        control.send(None)
+    server.shutdown()
+
+def measure(control: Connection, fn: Callable, trace: bool = False) -> dict:
+    control.send('reset')
+    control.recv()
+    if trace:
+        tracemalloc.start()
+    start = perf_counter()
+    with open(os.devnull, 'w') as devnull, redirect_stdout(devnull):
+        fn()
+    seconds = perf_counter() - start
+    peak = 0
+    if trace:
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    control.send('stats')
+    requests, bytes_sent = control.recv()
+    return {
+        'seconds': round(seconds, 3),
+        'requests': requests,
+        'bytes': bytes_sent,
+        'peak_mb': round(peak / 2**20, 2),
+    }
+
+def run_phases(scans: int, args: argparse.Namespace, trace: bool) -> dict[str, dict]:
+    context = get_context('spawn')
+    control, child = context.Pipe()
+    process = context.Process(target=run_mock, args=(child, {
+        'latency': args.latency, 'export_time': args.export_time,
+        'hosts_per_scan': args.hosts, 'findings_per_host': args.findings}), daemon=True)
+    process.start()
+    results = {}
+    try:
+        port = control.recv()
+        with tempfile.TemporaryDirectory(prefix='nessusapi-bench-') as directory:
+            config = make_config(directory, '127.0.0.1', port, scans)
+            outdir = os.path.join(directory, 'export')
+            results['init'] = measure(control, lambda: NessusAPI(file=config, initialize=True, workers=args.workers), trace)
+            results['reinit'] = measure(control, lambda: NessusAPI(file=config, initialize=True, workers=args.workers), trace)
+            control.send('complete')
+            control.recv()
+            nessus = NessusAPI(file=config, workers=args.workers)
+            results['export'] = measure(control, lambda: nessus.export_all_scans(outdir, incremental=True), trace)
+            results['reexport'] = measure(control, lambda: nessus.export_all_scans(outdir, incremental=True), trace)
+    finally:
+        control.send('stop')
+        process.join()
+    return results
+
+def benchmark(scans: int, args: argparse.Namespace) -> dict[str, dict]:
+    results = run_phases(scans, args, trace=False)
+    for phase, result in run_phases(scans, args, trace=True).items():
+        results[phase]['peak_mb'] = result['peak_mb']
+    return results
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark NessusAPI init/export against a local mock Nessus")
+    parser.add_argument('-s', '--scales', metavar="N", type=int, nargs='*', default=[10, 100, 1000], help='Numbers of scans to benchmark (default=10 100 1000)')
+    parser.add_argument('-j', '--workers', metavar="N", type=int, default=4, help='NessusAPI worker count (default=4)')
+    parser.add_argument('--latency', metavar="SECONDS", type=float, default=0.005, help='Mock latency per request (default=0.005)')
+    parser.add_argument('--export-time', metavar="SECONDS", type=float, default=0.05, help='Mock export build time (default=0.05)')
+    parser.add_argument('--hosts', metavar="N", type=int, default=10, help='Hosts in each exported scan (default=10)')
+    parser.add_argument('--findings', metavar="N", type=int, default=20, help='Findings per host in each exported scan (default=20)')
+    parser.add_argument('--json', metavar="FILE", help='Also write the results to a JSON file')
+    args = parser.parse_args()
+
+    all_results = {}
+    print(f"{'scans':>6} {'phase':<9} {'seconds':>9} {'requests':>9} {'MB sent':>9} {'peak MB':>8}")
+    for scale in args.scales:
+        all_results[scale] = benchmark(scale, args)
+        for phase, result in all_results[scale].items():
+            print(f"{scale:>6} {phase:<9} {result['seconds']:>9.3f} {result['requests']:>9} "
+                  f"{result['bytes'] / 2**20:>9.2f} {result['peak_mb']:>8.2f}")
+    if args.json:
+        with open(args.json, 'w') as file:
+            file.write(json.dumps(all_results, indent=2))
@@ -0,0 +1,141 @@
+import os
+import sqlite3
+from typing import Optional
+from nessusparser import iter_findings
+
+INDEX_NAME = 'findings.db'
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS files (
+    id INTEGER PRIMARY KEY,
+    path TEXT UNIQUE NOT NULL,
+    size INTEGER NOT NULL,
+    mtime REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS findings (
+    id INTEGER PRIMARY KEY,
+    file_id INTEGER NOT NULL REFERENCES files(id) ON DELETE CASCADE,
+    report TEXT,
+    host TEXT,
+    host_ip TEXT,
+    host_fqdn TEXT,
+    port INTEGER,
+    protocol TEXT,
+    svc_name TEXT,
+    severity INTEGER,
+    plugin_id INTEGER,
+    plugin_name TEXT,
+    plugin_family TEXT,
+    risk_factor TEXT
+);
+CREATE TABLE IF NOT EXISTS cves (
+    finding_id INTEGER NOT NULL REFERENCES findings(id) ON DELETE CASCADE,
+    cve TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS findings_file ON findings(file_id);
+CREATE INDEX IF NOT EXISTS findings_host ON findings(host);
+CREATE INDEX IF NOT EXISTS findings_host_ip ON findings(host_ip);
+CREATE INDEX IF NOT EXISTS findings_host_fqdn ON findings(host_fqdn);
+CREATE INDEX IF NOT EXISTS findings_plugin ON findings(plugin_id);
+CREATE INDEX IF NOT EXISTS findings_severity ON findings(severity);
+CREATE INDEX IF NOT EXISTS findings_port ON findings(port);
+CREATE INDEX IF NOT EXISTS cves_cve ON cves(cve);
+CREATE INDEX IF NOT EXISTS cves_finding ON cves(finding_id);
+'''
+
+COLUMNS = ['report', 'host', 'host_ip', 'host_fqdn', 'port', 'protocol', 'svc_name',
+           'severity', 'plugin_id', 'plugin_name', 'plugin_family', 'risk_factor']
+
+def _int(value: Optional[str]) -> Optional[int]:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+class FindingsIndex():
+    # SQLite index of the findings in exported .nessus files, keyed by host, plugin id, severity,
+    # CVE and port. Files are re-read only when their size or mtime changed since the last ingest.
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.db = sqlite3.connect(path)
+        self.db.row_factory = sqlite3.Row
+        self.db.execute('PRAGMA foreign_keys = ON')
+        self.db.execute('PRAGMA journal_mode = WAL')
+        self.db.execute('PRAGMA synchronous = NORMAL')
+        self.db.executescript(SCHEMA)
+
+    def close(self) -> None:
+        self.db.close()
+
+    def ingest(self, path: str) -> Optional[int]:
+        # returns the number of findings indexed, or None if the file is unchanged
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+        row = self.db.execute('SELECT id, size, mtime FROM files WHERE path = ?', (path,)).fetchone()
+        if row and row['size'] == stat.st_size and row['mtime'] == stat.st_mtime:
+            return None
+
+        count = 0
+        with self.db:
+            if row:
+                self.db.execute('DELETE FROM files WHERE id = ?', (row['id'],))
+            file_id = self.db.execute('INSERT INTO files (path, size, mtime) VALUES (?, ?, ?)',
+                                      (path, stat.st_size, stat.st_mtime)).lastrowid
+            for finding in iter_findings(path):
+                finding_id = self.db.execute(
+                    f"INSERT INTO findings (file_id, {', '.join(COLUMNS)}) VALUES ({', '.join(['?'] * (len(COLUMNS) + 1))})",
+                    (file_id, finding['report'], finding['host'], finding.get('host_ip'), finding.get('host_fqdn'),
+                     _int(finding.get('port')), finding.get('protocol'), finding.get('svc_name'),
+                     _int(finding.get('severity')), _int(finding.get('pluginID')), finding.get('pluginName'),
+                     finding.get('pluginFamily'), finding.get('risk_factor'))).lastrowid
+                cves = finding.get('cve', [])
+                cves = cves if isinstance(cves, list) else [cves]
+                self.db.executemany('INSERT INTO cves (finding_id, cve) VALUES (?, ?)',
+                                    [(finding_id, cve.upper()) for cve in cves if cve])
+                count += 1
+        return count
+
+    def ingest_dir(self, directory: str) -> dict[str, Optional[int]]:
+        # index every .nessus file in a directory and forget files that were deleted from it
+        directory = os.path.abspath(directory)
+        results = {}
+        for name in sorted(os.listdir(directory)):
+            if name.endswith('.nessus'):
+                results[name] = self.ingest(os.path.join(directory, name))
+        with self.db:
+            for row in self.db.execute('SELECT id, path FROM files').fetchall():
+                if os.path.dirname(row['path']) == directory and not os.path.exists(row['path']):
+                    self.db.execute('DELETE FROM files WHERE id = ?', (row['id'],))
+        return results
+
+    def query(self,
+              host: Optional[str] = None,
+              plugin_id: Optional[int] = None,
+              severity: Optional[int] = None,
+              cve: Optional[str] = None,
+              port: Optional[int] = None,
+              limit: Optional[int] = None) -> list[dict]:
+        # every filter given must match; severity is a minimum
+        clauses, params = [], []
+        if host:
+            clauses.append('(f.host = ? OR f.host_ip = ? OR f.host_fqdn = ?)')
+            params += [host, host, host]
+        if plugin_id is not None:
+            clauses.append('f.plugin_id = ?')
+            params.append(plugin_id)
+        if severity is not None:
+            clauses.append('f.severity >= ?')
+            params.append(severity)
+        if port is not None:
+            clauses.append('f.port = ?')
+            params.append(port)
+        if cve:
+            clauses.append('f.id IN (SELECT finding_id FROM cves WHERE cve = ?)')
+            params.append(cve.upper())
+        sql = f"SELECT {', '.join('f.' + c for c in COLUMNS)}, files.path AS file FROM findings f JOIN files ON files.id = f.file_id"
+        if clauses:
+            sql += f" WHERE {' AND '.join(clauses)}"
+        sql += ' ORDER BY f.host, f.port, f.severity DESC, f.plugin_id'
+        if limit:
+            sql += f' LIMIT {int(limit)}'
+        return [dict(row) for row in self.db.execute(sql, params)]
@@ -0,0 +1,53 @@
+#!/bin/sh
+
+set -e
+
+# Build frozen single-file executables of nessus-configure and nessus-policy-update with pyinstaller.
+# Usage: sh freeze.sh [DIST_DIR]   (run with the python that has pytenable and pyinstaller installed)
+#
+# Tuned for cold starts off the live CD's squashfs:
+#   --noupx           UPX saves a few MB but every launch pays to decompress the archive again
+#   --optimize 1      ship pre-optimized bytecode, no .pyc writes on a read-only filesystem
+#   --exclude-module  drop stdlib packages the tools never import so there is less to unpack
+#   --runtime-tmpdir  unpack into /dev/shm (RAM) instead of the overlay-backed /tmp
+# Set FREEZE_MODE=onedir to skip the per-launch unpacking entirely at the cost of a directory per tool.
+
+SRC_DIR=$(cd "$(dirname "$0")" && pwd)
+DIST_DIR=${1:-"$SRC_DIR/dist"}
+BUILD_DIR=$(mktemp -d)
+FREEZE_MODE=${FREEZE_MODE:-onefile}
+
+EXCLUDES="tkinter \
+          unittest \
+          pydoc \
+          doctest \
+          lib2to3 \
+          test \
+          idlelib \
+          turtle \
+          turtledemo \
+          curses"
+
+exclude_args=""
+for module in $EXCLUDES; do
+    exclude_args="$exclude_args --exclude-module $module"
+done
+
+runtime_args=""
+if [ "$FREEZE_MODE" = "onefile" ]; then
+    runtime_args="--runtime-tmpdir /dev/shm"
+fi
+
+for tool in nessus-configure nessus-policy-update; do
+    python -m PyInstaller --noconfirm --clean --log-level WARN \
+        --"$FREEZE_MODE" --noupx --optimize 1 $runtime_args $exclude_args \
+        --paths "$SRC_DIR" \
+        --name "$tool" \
+        --distpath "$DIST_DIR" \
+        --workpath "$BUILD_DIR/build" \
+        --specpath "$BUILD_DIR" \
+        "$SRC_DIR/$tool.py"
+done
+
+rm -rf "$BUILD_DIR"
+echo "Frozen tools written to: $DIST_DIR"
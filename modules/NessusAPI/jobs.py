@@ -0,0 +1,63 @@
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Callable, Optional
+
+class DependencyError(Exception):
+    pass
+
+class JobGraph():
+    # Runs named jobs on a bounded thread pool. A job starts as soon as every job it depends on has
+    # finished successfully; jobs whose dependencies failed are skipped with a DependencyError.
+    # Errors never stop unrelated jobs, they are collected in `errors` keyed by job name.
+    def __init__(self, workers: int = 4) -> None:
+        self.workers = max(1, workers)
+        self.jobs = {}
+        self.results = {}
+        self.errors = {}
+
+    def add(self, name: str, fn: Callable, *args, deps: list[str] = (), **kwargs) -> str:
+        if name in self.jobs:
+            raise KeyError(f"Duplicate job: '{name}'")
+        self.jobs[name] = (fn, args, kwargs, [dep for dep in deps if dep])
+        return name
+
+    def run(self, on_done: Optional[Callable[[str, Optional[Exception]], None]] = None) -> dict[str, Exception]:
+        for name, (_, _, _, deps) in self.jobs.items():
+            for dep in deps:
+                if dep not in self.jobs:
+                    raise KeyError(f"Job '{name}' depends on unknown job '{dep}'")
+
+        pending = dict(self.jobs)
+        running = {}
+
+        def finish(name: str, error: Optional[Exception] = None, result=None) -> None:
+            if error:
+                self.errors[name] = error
+            else:
+                self.results[name] = result
+            if on_done:
+                on_done(name, error)
+
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            while pending or running:
+                for name, (fn, args, kwargs, deps) in list(pending.items()):
+                    failed = [dep for dep in deps if dep in self.errors]
+                    if failed:
+                        del pending[name]
+                        finish(name, DependencyError(f"Skipped, dependency failed: {', '.join(failed)}"))
+                    elif all(dep in self.results for dep in deps):
+                        del pending[name]
+                        running[pool.submit(fn, *args, **kwargs)] = name
+                if not running:
+                    if pending: # only possible with a dependency cycle
+                        for name in list(pending):
+                            del pending[name]
+                            finish(name, DependencyError("Skipped, dependency cycle"))
+                    break
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    try:
+                        finish(name, result=future.result())
+                    except Exception as e:
+                        finish(name, e)
+        return self.errors
@@ -0,0 +1,119 @@
+import json
+import os
+from collections import Counter
+from hashlib import sha256
+from threading import Lock
+from typing import Optional
+
+MANIFEST_NAME = '.nessusapi-manifest.json'
+
+def export_filename(name: str, suffix: str) -> str:
+    # scan names may contain path separators (sharded scans are named "<name> [i/N]")
+    return f"{name.replace(os.sep, '_')}{suffix}"
+
+def export_names(scans: list[dict], node: str = '', shared_names: set[str] = frozenset()) -> dict[int, str]:
+    # file name (without suffix) of each scan's exports, by scan id. scan names are only unique per
+    # folder, a name several of `scans` have gets the scan id appended. pool nodes export into one
+    # directory, a scan name that another node also has gets the node ("<host>_<port>") appended there
+    counts = Counter(scan['name'] for scan in scans)
+    names = {}
+    for scan in scans:
+        name = scan['name']
+        if name in shared_names:
+            name = f"{name}_{node.replace(':', '_')}"
+        if counts[scan['name']] > 1:
+            name = f"{name}_{scan['id']}"
+        names[scan['id']] = name
+    return names
+
+def file_sha256(path: str) -> str:
+    digest = sha256()
+    with open(path, 'rb') as file:
+        for chunk in iter(lambda: file.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def entry_file(entry: dict) -> str:
+    # manifests written before entries recorded their file name used the scan name
+    return entry.get('file', entry['name'])
+
+class ExportManifest():
+    # Tracks what has already been exported to an output directory. Entries are keyed by scan id:
+    # { "<scan id>": { "name": ..., "file": <file name, see export_names>, "last_modification_date": ...,
+    #                  "files": { "<suffix>": { "format": ..., "sha256": ..., "size": ... } } } }
+    # A scan's file is current while the scan's last_modification_date is unchanged and the file on
+    # disk still has the recorded size (hashes are recorded, not re-verified, to keep reruns cheap).
+    def __init__(self, outdir: str, name: str = MANIFEST_NAME) -> None:
+        self.outdir = outdir
+        self.path = os.path.join(outdir, name)
+        self.entries = {}
+        self._lock = Lock()
+        if os.path.exists(self.path):
+            with open(self.path, encoding='utf-8') as file:
+                self.entries = json.loads(file.read()).get('scans', {})
+
+    def save(self) -> None:
+        with self._lock:
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as file:
+                file.write(json.dumps({'scans': self.entries}, indent=2))
+            os.replace(tmp_path, self.path)
+
+    def outfile(self, name: str, suffix: str) -> str:
+        return os.path.join(self.outdir, export_filename(name, suffix))
+
+    def is_current(self, scan: dict, suffix: str, name: Optional[str] = None) -> bool:
+        entry = self.entries.get(str(scan['id']))
+        if not entry or entry['last_modification_date'] != scan['last_modification_date'] \
+                or entry_file(entry) != (name or scan['name']):
+            return False
+        exported = entry['files'].get(suffix)
+        outfile = self.outfile(entry_file(entry), suffix)
+        return bool(exported) and os.path.exists(outfile) and os.path.getsize(outfile) == exported['size']
+
+    def record(self, scan: dict, fmt: str, suffix: str, name: Optional[str] = None) -> None:
+        name = name or scan['name']
+        outfile = self.outfile(name, suffix)
+        exported = {'format': fmt, 'sha256': file_sha256(outfile), 'size': os.path.getsize(outfile)}
+        with self._lock:
+            entry = self.entries.get(str(scan['id']))
+            if not entry or entry['last_modification_date'] != scan['last_modification_date'] or entry_file(entry) != name:
+                entry = self.entries[str(scan['id'])] = {
+                    'name': scan['name'],
+                    'file': name,
+                    'last_modification_date': scan['last_modification_date'],
+                    'files': {},
+                }
+            entry['files'][suffix] = exported
+
+    def rename(self, scan: dict, name: Optional[str] = None) -> list[tuple[str, str]]:
+        # move files of a scan renamed on the server (or whose file name changed) instead of downloading
+        # it again
+        name = name or scan['name']
+        entry = self.entries.get(str(scan['id']))
+        if not entry or (entry['name'] == scan['name'] and entry_file(entry) == name):
+            return []
+        renamed = []
+        for suffix in list(entry['files']):
+            old_file, new_file = self.outfile(entry_file(entry), suffix), self.outfile(name, suffix)
+            if os.path.exists(old_file):
+                os.replace(old_file, new_file)
+                renamed.append((old_file, new_file))
+            else:
+                del entry['files'][suffix]
+        entry['name'] = scan['name']
+        entry['file'] = name
+        return renamed
+
+    def prune(self, live_scan_ids: set, delete_files: bool = False) -> list[dict]:
+        # drop scans that no longer exist on the server, optionally deleting their exported files
+        removed = []
+        for scan_id in [i for i in self.entries if int(i) not in live_scan_ids]:
+            entry = self.entries.pop(scan_id)
+            if delete_files:
+                for suffix in entry['files']:
+                    outfile = self.outfile(entry_file(entry), suffix)
+                    if os.path.exists(outfile):
+                        os.remove(outfile)
+            removed.append(entry)
+        return removed
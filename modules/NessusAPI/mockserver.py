@@ -0,0 +1,357 @@
+#!/usr/bin/env python3
+
+import argparse
+import json
+import os
+import re
+import ssl
+import tempfile
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from itertools import count
+from subprocess import run
+from threading import Lock, Thread
+from time import sleep, time
+from typing import Optional
+from urllib.parse import urlparse, parse_qs
+
+# A local stand-in for the parts of the Nessus REST API that NessusAPI uses, for exercising and
+# benchmarking init/export without a licensed scanner. State lives in memory. Every request can be
+# delayed by `latency` seconds, exports stay "loading" for `export_time` seconds and launched scans
+# run for `scan_time` seconds.
+
+TEMPLATES = [
+    {'uuid': 'ab4bacd2-05f6-425c-9d79-3ba3940ad1c24e51e1f403febe40', 'name': 'advanced', 'title': 'Advanced Scan'},
+    {'uuid': 'bbd4f805-3966-d464-b2d1-0079eb89d69708c3a05ec2812bcf', 'name': 'discovery', 'title': 'Host Discovery'},
+    {'uuid': '731a8e52-3ea6-a291-ec0a-d2ff0619c19d7bd788d6be818b65', 'name': 'basic', 'title': 'Basic Network Scan'},
+]
+
+class MockNessus():
+    def __init__(self,
+                 latency: float = 0,
+                 export_time: float = 0,
+                 scan_time: float = 0,
+                 hosts_per_scan: int = 10,
+                 findings_per_host: int = 20) -> None:
+        self.latency = latency
+        self.export_time = export_time
+        self.scan_time = scan_time
+        self.hosts_per_scan = hosts_per_scan
+        self.findings_per_host = findings_per_host
+        self.lock = Lock()
+        self.ids = count(10)
+        self.requests = Counter()
+        self.bytes_sent = 0
+        self.folders = {1: {'id': 1, 'name': 'My Scans', 'type': 'main'}, 2: {'id': 2, 'name': 'Trash', 'type': 'trash'}}
+        self.policies = {}
+        self.scans = {}
+        self.exports = {}
+        self.uploads = {}
+
+    def now(self) -> int:
+        return int(time())
+
+    def reset_stats(self) -> None:
+        with self.lock:
+            self.requests.clear()
+            self.bytes_sent = 0
+
+    def complete_all(self) -> None:
+        # mark every scan as finished so it can be exported
+        with self.lock:
+            for scan in self.scans.values():
+                scan['status'] = 'completed'
+                scan['last_modification_date'] = self.now()
+
+    def _scan_status(self, scan: dict) -> dict:
+        if scan['status'] == 'running' and time() - scan['started'] >= self.scan_time:
+            scan['status'] = 'completed'
+            scan['last_modification_date'] = self.now()
+        return {k: v for k, v in scan.items() if k not in ('settings', 'started')}
+
+    def report(self, scan: dict) -> bytes:
+        # synthetic .nessus results for a scan
+        parts = ['<?xml version="1.0" ?>\n<NessusClientData_v2>', f'<Report name="{scan["name"]}">']
+        for h in range(self.hosts_per_scan):
+            ip = f"10.{scan['id'] % 256}.{h // 256 % 256}.{h % 256}"
+            parts.append(f'<ReportHost name="{ip}"><HostProperties><tag name="host-ip">{ip}</tag>'
+                         f'<tag name="operating-system">Linux Kernel</tag></HostProperties>')
+            for i in range(self.findings_per_host):
+                parts.append(f'<ReportItem port="{(i * 7) % 1024}" svc_name="general" protocol="tcp" severity="{i % 5}" '
+                             f'pluginID="{10000 + i}" pluginName="Mock Plugin {i}" pluginFamily="General">'
+                             f'<risk_factor>{"None Low Medium High Critical".split()[i % 5]}</risk_factor>'
+                             f'<cve>CVE-2024-{1000 + i}</cve><description>Mock finding {i}</description>'
+                             f'<plugin_output>output {i}</plugin_output></ReportItem>')
+            parts.append('</ReportHost>')
+        parts.append('</Report></NessusClientData_v2>\n')
+        return ''.join(parts).encode()
+
+    # route handlers: (method, path regex) -> handler(match, query, body) returning (status, body)
+    def session_create(self, m, q, body):
+        return 200, {'token': 'mock-token'}
+
+    def session_delete(self, m, q, body):
+        return 200, {}
+
+    def server_properties(self, m, q, body):
+        return 200, {'nessus_type': 'Nessus', 'server_version': '10.8.0'}
+
+    def folders_list(self, m, q, body):
+        return 200, {'folders': list(self.folders.values())}
+
+    def folders_create(self, m, q, body):
+        folder_id = next(self.ids)
+        self.folders[folder_id] = {'id': folder_id, 'name': body['name'], 'type': 'custom'}
+        return 200, {'id': folder_id}
+
+    def file_upload(self, m, q, body):
+        name = f"upload-{next(self.ids)}"
+        self.uploads[name] = len(body or b'')
+        return 200, {'fileuploaded': name}
+
+    def policies_list(self, m, q, body):
+        return 200, {'policies': [{k: v for k, v in p.items() if k not in ('settings', 'credentials')}
+                                  for p in self.policies.values()]}
+
+    def policies_import(self, m, q, body):
+        if body.get('file') not in self.uploads:
+            return 404, {'error': 'File not found'}
+        policy_id = next(self.ids)
+        self.policies[policy_id] = {
+            'id': policy_id, 'name': f"Imported {policy_id}", 'description': '', 'template_uuid': TEMPLATES[0]['uuid'],
+            'last_modification_date': self.now(), 'settings': {'name': f"Imported {policy_id}"}, 'credentials': {},
+        }
+        return 200, {'id': policy_id, 'name': self.policies[policy_id]['name']}
+
+    def policies_details(self, m, q, body):
+        policy = self.policies.get(int(m['id']))
+        if not policy:
+            return 404, {'error': 'Policy not found'}
+        return 200, {'uuid': policy['template_uuid'], 'settings': dict(policy['settings']),
+                     'credentials': {'edit': policy['credentials']}}
+
+    def policies_edit(self, m, q, body):
+        policy = self.policies.get(int(m['id']))
+        if not policy:
+            return 404, {'error': 'Policy not found'}
+        settings = body.get('settings') or {}
+        policy['settings'].update(settings)
+        policy['name'] = policy['settings'].get('name', policy['name'])
+        policy['description'] = policy['settings'].get('description', policy['description'])
+        credentials = body.get('credentials') or {}
+        for credential_id in credentials.get('delete') or []:
+            policy['credentials'].pop(str(credential_id), None)
+        for category in (credentials.get('add') or {}).values():
+            for kind in category.values():
+                for credential in kind:
+                    policy['credentials'][str(next(self.ids))] = credential
+        policy['last_modification_date'] = self.now()
+        return 200, {}
+
+    def policies_copy(self, m, q, body):
+        policy = self.policies.get(int(m['id']))
+        if not policy:
+            return 404, {'error': 'Policy not found'}
+        policy_id = next(self.ids)
+        self.policies[policy_id] = {**policy, 'id': policy_id, 'name': f"Copy of {policy['name']}",
+                                    'settings': {**policy['settings'], 'name': f"Copy of {policy['name']}"},
+                                    'credentials': dict(policy['credentials'])}
+        return 200, {'id': policy_id, 'name': self.policies[policy_id]['name']}
+
+    def policies_delete(self, m, q, body):
+        return (200, {}) if self.policies.pop(int(m['id']), None) else (404, {'error': 'Policy not found'})
+
+    def templates_list(self, m, q, body):
+        return 200, {'templates': TEMPLATES}
+
+    def scans_list(self, m, q, body):
+        scans = [self._scan_status(scan) for scan in self.scans.values()]
+        if q.get('folder_id'):
+            scans = [scan for scan in scans if scan['folder_id'] == int(q['folder_id'][0])]
+        if q.get('last_modification_date'):
+            scans = [scan for scan in scans if scan['last_modification_date'] > int(q['last_modification_date'][0])]
+        return 200, {'folders': list(self.folders.values()), 'scans': scans or None, 'timestamp': self.now()}
+
+    def scans_create(self, m, q, body):
+        scan_id = next(self.ids)
+        settings = body['settings']
+        self.scans[scan_id] = {
+            'id': scan_id, 'uuid': f"template-{scan_id}", 'name': settings['name'], 'folder_id': settings.get('folder_id', 1),
+            'status': 'empty', 'enabled': settings.get('enabled', False), 'read': False, 'type': 'local',
+            'creation_date': self.now(), 'last_modification_date': self.now(), 'settings': settings, 'started': 0,
+        }
+        return 200, {'scan': self._scan_status(self.scans[scan_id])}
+
+    def scans_configure(self, m, q, body):
+        scan = self.scans.get(int(m['id']))
+        if not scan:
+            return 404, {'error': 'Scan not found'}
+        scan['settings'].update(body.get('settings') or {})
+        scan['name'] = scan['settings']['name']
+        scan['folder_id'] = scan['settings'].get('folder_id', scan['folder_id'])
+        scan['last_modification_date'] = self.now()
+        return 200, {'id': scan['id']}
+
+    def scans_details(self, m, q, body):
+        scan = self.scans.get(int(m['id']))
+        if not scan:
+            return 404, {'error': 'Scan not found'}
+        return 200, {'info': {**self._scan_status(scan), 'targets': scan['settings'].get('text_targets')}, 'hosts': []}
+
+    def scans_launch(self, m, q, body):
+        scan = self.scans.get(int(m['id']))
+        if not scan:
+            return 404, {'error': 'Scan not found'}
+        scan['status'] = 'running'
+        scan['started'] = time()
+        scan['last_modification_date'] = self.now()
+        return 200, {'scan_uuid': f"run-{next(self.ids)}"}
+
+    def scans_delete(self, m, q, body):
+        return (200, {}) if self.scans.pop(int(m['id']), None) else (404, {'error': 'Scan not found'})
+
+    def scans_stop(self, m, q, body):
+        scan = self.scans.get(int(m['id']))
+        if not scan:
+            return 404, {'error': 'Scan not found'}
+        scan['status'] = 'canceled'
+        scan['last_modification_date'] = self.now()
+        return 200, {}
+
+    def scans_export(self, m, q, body):
+        scan = self.scans.get(int(m['id']))
+        if not scan:
+            return 404, {'error': 'Scan not found'}
+        file_id = next(self.ids)
+        self.exports[file_id] = {'scan': scan['id'], 'format': (body or {}).get('format', 'nessus'), 'requested': time()}
+        return 200, {'file': file_id, 'token': f"export-{file_id}"}
+
+    def scans_export_status(self, m, q, body):
+        export = self.exports.get(int(m['file']))
+        if not export:
+            return 404, {'error': 'Export not found'}
+        return 200, {'status': 'ready' if time() - export['requested'] >= self.export_time else 'loading'}
+
+    def scans_export_download(self, m, q, body):
+        export = self.exports.get(int(m['file']))
+        if not export or time() - export['requested'] < self.export_time:
+            return 409, {'error': 'Report is still being generated'}
+        scan = self.scans[export['scan']]
+        if export['format'] == 'nessus':
+            return 200, self.report(scan)
+        return 200, f"%PDF-1.4 mock {export['format']} report for {scan['name']}\n".encode()
+
+    ROUTES = [
+        ('POST', r'/session', 'session_create'),
+        ('DELETE', r'/session', 'session_delete'),
+        ('GET', r'/server/(properties|status)', 'server_properties'),
+        ('GET', r'/folders', 'folders_list'),
+        ('POST', r'/folders', 'folders_create'),
+        ('POST', r'/file/upload', 'file_upload'),
+        ('GET', r'/policies', 'policies_list'),
+        ('POST', r'/policies/import', 'policies_import'),
+        ('GET', r'/policies/(?P<id>\d+)', 'policies_details'),
+        ('PUT', r'/policies/(?P<id>\d+)', 'policies_edit'),
+        ('POST', r'/policies/(?P<id>\d+)/copy', 'policies_copy'),
+        ('DELETE', r'/policies/(?P<id>\d+)', 'policies_delete'),
+        ('GET', r'/editor/(policy|scan)/templates', 'templates_list'),
+        ('GET', r'/scans', 'scans_list'),
+        ('POST', r'/scans', 'scans_create'),
+        ('PUT', r'/scans/(?P<id>\d+)', 'scans_configure'),
+        ('GET', r'/scans/(?P<id>\d+)', 'scans_details'),
+        ('DELETE', r'/scans/(?P<id>\d+)', 'scans_delete'),
+        ('POST', r'/scans/(?P<id>\d+)/launch', 'scans_launch'),
+        ('POST', r'/scans/(?P<id>\d+)/stop', 'scans_stop'),
+        ('POST', r'/scans/(?P<id>\d+)/export', 'scans_export'),
+        ('GET', r'/scans/(?P<id>\d+)/export/(?P<file>\d+)/status', 'scans_export_status'),
+        ('GET', r'/scans/(?P<id>\d+)/export/(?P<file>\d+)/download', 'scans_export_download'),
+        # newer pyTenable releases poll and download exports by token
+        ('GET', r'/tokens/export-(?P<file>\d+)/status', 'scans_export_status'),
+        ('GET', r'/tokens/export-(?P<file>\d+)/download', 'scans_export_download'),
+    ]
+
+    def handle(self, method: str, path: str, body: bytes, content_type: str) -> tuple[int, bytes, str]:
+        url = urlparse(path)
+        for route_method, pattern, handler in self.ROUTES:
+            match = re.fullmatch(pattern, url.path.rstrip('/'))
+            if route_method == method and match:
+                if self.latency:
+                    sleep(self.latency)
+                payload = body
+                if body and 'json' in content_type:
+                    payload = json.loads(body)
+                with self.lock:
+                    self.requests[handler] += 1
+                    status, result = getattr(self, handler)(match.groupdict(), parse_qs(url.query), payload or {})
+                if isinstance(result, bytes):
+                    return status, result, 'application/octet-stream'
+                return status, json.dumps(result).encode(), 'application/json'
+        with self.lock:
+            self.requests["unknown"] += 1
+        return 404, json.dumps({'error': f"No mock route for {method} {url.path}"}).encode(), 'application/json'
+
+class MockRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def _respond(self) -> None:
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length) if length else b''
+        status, payload, content_type = self.server.mock.handle(self.command, self.path, body,
+                                                                self.headers.get('Content-Type') or '')
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+        with self.server.mock.lock:
+            self.server.mock.bytes_sent += len(payload)
+
+    do_GET = do_POST = do_PUT = do_DELETE = _respond
+
+    def log_message(self, format: str, *args) -> None:
+        pass
+
+def self_signed_cert(directory: str) -> tuple[str, str]:
+    certfile, keyfile = os.path.join(directory, 'mock.crt'), os.path.join(directory, 'mock.key')
+    result = run(['openssl', 'req', '-x509', '-newkey', 'rsa:2048', '-nodes', '-keyout', keyfile, '-out', certfile,
+                  '-days', '1', '-subj', '/CN=localhost'], capture_output=True)
+    if result.returncode:
+        raise OSError(f"Could not create a certificate for the mock server: {result.stderr.decode()}")
+    return certfile, keyfile
+
+def serve(mock: MockNessus,
+          host: str = '127.0.0.1',
+          port: int = 0,
+          certfile: Optional[str] = None,
+          keyfile: Optional[str] = None) -> ThreadingHTTPServer:
+    # start the mock over https in a background thread; the bound port is server.server_address[1]
+    server = ThreadingHTTPServer((host, port), MockRequestHandler)
+    server.daemon_threads = True
+    server.mock = mock
+    if not certfile:
+        certfile, keyfile = self_signed_cert(tempfile.mkdtemp(prefix='mocknessus-'))
+    context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+    context.load_cert_chain(certfile, keyfile)
+    server.socket = context.wrap_socket(server.socket, server_side=True)
+    Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Run a local mock of the Nessus REST API used by NessusAPI")
+    parser.add_argument('-H', '--host', default='127.0.0.1', help='Address to listen on (default=127.0.0.1)')
+    parser.add_argument('-p', '--port', type=int, default=8834, help='Port to listen on (default=8834)')
+    parser.add_argument('--latency', type=float, default=0, help='Seconds added to every request (default=0)')
+    parser.add_argument('--export-time', type=float, default=0, help='Seconds an export takes to build (default=0)')
+    parser.add_argument('--scan-time', type=float, default=0, help='Seconds a launched scan runs (default=0)')
+    parser.add_argument('--cert', metavar="CERTFILE", help='TLS certificate (default=generate a self-signed one)')
+    parser.add_argument('--key', metavar="KEYFILE", help='TLS private key for --cert')
+    args = parser.parse_args()
+
+    mock = MockNessus(latency=args.latency, export_time=args.export_time, scan_time=args.scan_time)
+    server = serve(mock, args.host, args.port, args.cert, args.key)
+    print(f"Mock Nessus listening on https://{args.host}:{server.server_address[1]}")
+    try:
+        while True:
+            sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -1,46 +1,173 @@
 #!/usr/bin/env python3
 
-import code
 import argparse
 from argparse import ArgumentError
 import os
+import json
+import sys
 from getpass import getpass
-from nessusapi import NessusAPI
+from typing import Optional, TYPE_CHECKING
 
-def interact(nessus: NessusAPI) -> None:
+# NessusAPI pulls in pyTenable, so it and the other command modules are imported only by the
+# commands that use them. --help, argument errors and offline commands never load them.
+if TYPE_CHECKING:
+    from nessusapi import NessusAPI
+    from pool import NessusPool
+    from profiling import Profiler
+
+# commands that work on local files only and never connect to Nessus
+OFFLINE_COMMANDS = ('index', 'query')
+
+def interact(nessus: 'NessusAPI', pool: Optional['NessusPool'] = None) -> None:
+    import code
     n = nessus.Nessus
     code.interact(local=locals())
 
+def print_plan(steps: list[dict], dry_run: bool = False) -> None:
+    for step in steps:
+        print(f"{step['action']:>8} {step['type']:<6} {step['name']}{' FAILED: ' + str(step['error']) if step.get('error') else ''}")
+    changes = len([step for step in steps if step['action'] != 'keep'])
+    failed = len([step for step in steps if step.get('error')])
+    print(f"{changes} change(s) {'planned' if dry_run else 'applied'}, {len(steps) - changes} unchanged{f', {failed} failed' if failed else ''}")
+
+def add_scheduler_args(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument('-m', '--max-running', metavar="N", type=int, default=2, help='Maximum number of scans running at once on each scanner (default=2)')
+    parser.add_argument('--poll', metavar=("MIN", "MAX"), type=float, nargs=2, default=[5, 120], help='Min/max seconds between status polls (default=5 120)')
+    parser.add_argument('-o', '--export-dir', metavar="OUTPUT_DIR", help='Export each scan to this directory as soon as it completes')
+    parser.add_argument('--export-format', metavar="FMT", nargs='*', default=['nessus'], help='Formats for completed scan exports (default=nessus)')
+
+def scheduler_options(args: argparse.Namespace) -> dict:
+    return {'max_running': args.max_running, 'min_interval': args.poll[0], 'max_interval': args.poll[1],
+            'export_dir': args.export_dir, 'export_formats': [f.lower() for f in args.export_format]}
+
+def run_scans(nessus: 'NessusAPI', scan_ids: list[int], args: argparse.Namespace) -> None:
+    from scheduler import ScanScheduler
+    scheduler = ScanScheduler(nessus, **scheduler_options(args))
+    results = scheduler.run(scan_ids)
+    print(f"{len([s for s in results.values() if s == 'completed'])}/{len(scan_ids)} scan(s) completed")
+
+def run_pool_scans(pool: 'NessusPool', scan_ids: dict[str, list[int]], args: argparse.Namespace) -> None:
+    # --max-running applies to each scanner
+    results = pool.run_scans(scan_ids, **scheduler_options(args))
+    for server, node_results in results.items():
+        print(f"{server}: {len([s for s in node_results.values() if s == 'completed'])}/{len(scan_ids[server])} scan(s) completed")
+
+def watch(nodes: list['NessusAPI'], args: argparse.Namespace) -> None:
+    from watch import ScanWatcher, watch as watch_scans
+    watchers = [ScanWatcher(node, args.folder, resync=args.resync) for node in nodes]
+    events = None
+    try:
+        if args.events == '-':
+            events = sys.stdout
+        elif args.events:
+            events = open(args.events, 'a', encoding='utf-8')
+        watch_scans(watchers, interval=args.interval, events=events)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if events and events is not sys.stdout:
+            events.close()
+
+def index_path(path: str) -> str:
+    from findingsindex import INDEX_NAME
+    return os.path.join(path, INDEX_NAME) if os.path.isdir(path) else path
+
+def index(args: argparse.Namespace) -> None:
+    from findingsindex import FindingsIndex
+    findings = FindingsIndex(args.db or index_path(args.indir))
+    try:
+        for name, count in findings.ingest_dir(args.indir).items():
+            print(f"{name}: {'unchanged' if count is None else f'{count} finding(s) indexed'}")
+    finally:
+        findings.close()
+
+def query(args: argparse.Namespace) -> None:
+    from findingsindex import FindingsIndex
+    path = index_path(args.index)
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"ERROR: Findings index '{path}' does not exist, run the 'index' command first")
+    findings = FindingsIndex(path)
+    try:
+        rows = findings.query(host=args.host, plugin_id=args.plugin, severity=args.severity,
+                              cve=args.cve, port=args.port, limit=args.limit)
+    finally:
+        findings.close()
+    if args.json:
+        for row in rows:
+            print(json.dumps(row))
+        return
+    for row in rows:
+        # host level findings have no port, or port 0 (with protocol tcp); print neither for them
+        port, protocol = row['port'], row['protocol'] or ''
+        if port in (None, 0, '0'):
+            port, protocol = '', ''
+        print(f"{row['host']:<20} {port:>5}/{protocol:<4} sev={row['severity']} {row['plugin_id'] or '':>7} {row['plugin_name']}")
+    print(f"{len(rows)} finding(s)")
+
 def parse_args() -> None:
     parser = argparse.ArgumentParser(description="A command-line interface for nessus. Used to initialize/export a nessus instance or interact with the API.")
     parser.add_argument('-v', '--verbose', help='Add Verbosity')
+    parser.add_argument('--profile', metavar="TRACE_FILE", help='Time every NessusAPI method and API request, write a JSON trace and print the hottest calls at exit')
     login_group = parser.add_argument_group("Connection Info")
     login_group.add_argument('-c', '--config', metavar="CONFIG", help='JSON Nessus Credential/Policy/Scan configuration file')
     login_group.add_argument('-U', '--user', metavar="USERNAME", help='User to authenticate to Nessus')
     login_group.add_argument('-H', '--host', metavar="HOST", help='IP/hostname of the Nessus instance')
     login_group.add_argument('-p', '--port', metavar="PORT", help='Port to connect to Nessus')
+    login_group.add_argument('--pool-size', metavar="N", type=int, help='Maximum open connections to Nessus (default=max(workers, 10))')
+    login_group.add_argument('--retries', metavar="N", type=int, default=3, help='Retries for connection errors and 5xx responses (default=3)')
+    login_group.add_argument('--timeout', metavar="SECONDS", type=float, default=300, help='Timeout for each Nessus API request (default=300)')
 
     subparser = parser.add_subparsers(title='Commands', dest='command')
 
     export_parser = subparser.add_parser('export', description="Export Nessus Scans to Directory")
     export_parser.add_argument('-o', '--outdir', metavar="OUTPUT_DIR", help='Directory to export scan results to')
-    export_parser.add_argument('-f', '--format', metavar="FMT", nargs='*', default=['nessus'], required=False, help='Formats for scan exports: nessus, pdf, csv, html (default=nessus)')
+    export_parser.add_argument('-f', '--format', metavar="FMT", nargs='*', default=['nessus'], required=False, help='Formats for scan exports: nessus, pdf, csv, jsonl (default=nessus)')
     export_parser.add_argument('--scan_folder', metavar="FOLDER", required=False, help='Export all scans from a folder in Nessus')
+    export_parser.add_argument('-j', '--workers', metavar="N", type=int, default=4, help='Number of exports to run concurrently (default=4)')
+    export_parser.add_argument('-i', '--incremental', action='store_true', help='Only export scans changed since the last export to OUTPUT_DIR')
+    export_parser.add_argument('--prune', action='store_true', help='With --incremental, delete exports of scans removed from Nessus')
 
     init_parser = subparser.add_parser('init', description='Initialize Nessus Policies/Credentials and Scans')
     init_parser.add_argument('-e', '--exec', action='store_true', help="Inits Nessus and executes all scans from the config")
+    init_parser.add_argument('-j', '--workers', metavar="N", type=int, default=4, help='Number of policy imports/scan creations to run concurrently (default=4)')
+    init_parser.add_argument('-n', '--dry-run', action='store_true', help="Print the policies/scans that would be created or updated without changing Nessus")
+    add_scheduler_args(init_parser)
 
-    exec_parser = subparser.add_parser('exec', description='Use Python to interact with Nessus')
+    exec_parser = subparser.add_parser('exec', description='Execute Nessus scans, limiting how many run at once')
     exec_parser.add_argument('-f', '--folder', metavar="SCAN_FOLDER", help='Execute all scans in this folder')
     exec_parser.add_argument('-s', '--scan', metavar="SCAN_NAME", nargs='*', help='Execute one or more scans with this name')
+    add_scheduler_args(exec_parser)
+
+    watch_parser = subparser.add_parser('watch', description='Show a live status view of Nessus scans, polling only scans changed since the last poll')
+    watch_parser.add_argument('-f', '--folder', metavar="SCAN_FOLDER", help='Only watch the scans in this folder')
+    watch_parser.add_argument('-i', '--interval', metavar="SECONDS", type=float, default=10, help='Seconds between polls (default=10)')
+    watch_parser.add_argument('--resync', metavar="N", type=int, default=30, help='Take a full scan listing every N polls to notice deleted scans (default=30)')
+    watch_parser.add_argument('--events', metavar="FILE", help="Append scan state changes to FILE as JSON lines ('-' for stdout instead of the live view)")
 
     subparser.add_parser('interact', description='Use Python to interact with Nessus')
-    
+
+    index_parser = subparser.add_parser('index', description='Index exported .nessus files for fast offline queries')
+    index_parser.add_argument('indir', metavar="EXPORT_DIR", help='Directory of exported .nessus files')
+    index_parser.add_argument('--db', metavar="INDEX", help='Index file to update (default=EXPORT_DIR/findings.db)')
+
+    query_parser = subparser.add_parser('query', description='Query indexed findings by host, plugin, severity, CVE or port')
+    query_parser.add_argument('index', metavar="INDEX", help='Index file, or an export directory containing findings.db')
+    query_parser.add_argument('--host', metavar="HOST", help='Host name, IP or FQDN')
+    query_parser.add_argument('--plugin', metavar="PLUGIN_ID", type=int, help='Plugin ID')
+    query_parser.add_argument('--severity', metavar="N", type=int, help='Minimum severity (0=info .. 4=critical)')
+    query_parser.add_argument('--cve', metavar="CVE", help='CVE ID')
+    query_parser.add_argument('--port', metavar="PORT", type=int, help='Port number')
+    query_parser.add_argument('--limit', metavar="N", type=int, help='Maximum number of findings to print')
+    query_parser.add_argument('--json', action='store_true', help='Print findings as JSON lines')
+
     args = parser.parse_args()
 
     if args.verbose:
         print(args)
 
+    if args.command in OFFLINE_COMMANDS:
+        return args
+
     # login error checking
     if not ((args.user and args.host and args.port) or args.config):
         raise ArgumentError(message="Must specify either a config file and/or a user with a host/port")
@@ -52,13 +179,43 @@ def parse_args() -> None:
 
     return args
 
-def init() -> NessusAPI:
+def init() -> Optional['NessusAPI']:
     args = parse_args()
 
+    if args.command == 'index':
+        return index(args)
+    elif args.command == 'query':
+        return query(args)
+
+    profiler = None
+    if args.profile:
+        from nessusapi import NessusAPI
+        from profiling import Profiler
+        profiler = Profiler()
+        profiler.instrument_class(NessusAPI)
+    try:
+        return run_command(args, profiler)
+    finally:
+        if profiler:
+            profiler.write(args.profile)
+            print(profiler.summary())
+            print(f"Profile trace written to {args.profile}")
+
+def run_command(args: argparse.Namespace, profiler: Optional['Profiler'] = None) -> 'NessusAPI':
+    from nessusapi import NessusAPI, parse_config
     nessus = None
+    session_options = {
+        'workers': getattr(args, 'workers', 4),
+        'pool_size': args.pool_size,
+        'retries': args.retries,
+        'timeout': args.timeout,
+    }
+    if args.config and not args.host and parse_config(args.config).get('servers'):
+        return run_pool_command(args, session_options, profiler)
+
     if args.config:
         if args.user:
-            nessus = NessusAPI(file=args.config, initialize=(args.command == 'init'),
+            nessus = NessusAPI(file=args.config, **session_options,
                                 host=args.host, port=args.port,
                                 credentials={
                                     "type": "password",
@@ -66,15 +223,15 @@ def init() -> NessusAPI:
                                     "password": getpass("Nessus Password: ")
                                 })
         else:
-            nessus = NessusAPI(file=args.config, initialize=(args.command == 'init'))
+            nessus = NessusAPI(file=args.config, **session_options)
 
     elif args.host and args.user:
-        if args.command == 'initialize':
-            raise ArgumentError("Cannot initialize Nessus scans/policies without a config file.")
+        if args.command == 'init':
+            raise ArgumentError(None, "Cannot initialize Nessus scans/policies without a config file.")
         if not args.port: 
             args.port = 8834
         nessus = NessusAPI(host=args.host,
-                            port=args.port,
+                            port=args.port, **session_options,
                             credentials={
                                 "type": "password",
                                 "username": "acasuser",
@@ -83,14 +240,28 @@ def init() -> NessusAPI:
     else:
         pass # this error (lack of connection info) was checked earlier
 
+    if profiler:
+        profiler.instrument_session(nessus.Nessus._session)
+
     if args.command == "init":
-        if args.exec:
-            raise NotImplementedError("Auto execution of scans after init is not implemented")
+        steps = nessus.reconcile(parse_config(args.config), dry_run=args.dry_run)
+        print_plan(steps, dry_run=args.dry_run)
+        if args.exec and not args.dry_run:
+            run_scans(nessus, [step['id'] for step in steps if step['type'] == 'scan' and step['id']], args)
     elif args.command == "exec":
-        raise NotImplementedError("CLI execution of nessus scans is not implemented")
+        if not (args.folder or args.scan):
+            raise ArgumentError(None, "Specify scans to execute with --folder and/or --scan")
+        run_scans(nessus, [scan['id'] for scan in nessus.find_scans(args.scan, args.folder)], args)
 
     elif args.command == "export":
-        nessus.export_all_scans(outdir=args.outdir, export_formats=[f.lower() for f in args.format], scan_folder=args.scan_folder)
+        failures = nessus.export_all_scans(outdir=args.outdir, export_formats=[f.lower() for f in args.format],
+                                           scan_folder=args.scan_folder, workers=args.workers,
+                                           incremental=args.incremental, prune=args.prune)
+        if failures:
+            print(f"{len(failures)} export(s) failed")
+
+    elif args.command == 'watch':
+        watch([nessus], args)
 
     elif args.command == 'interact':
         interact(nessus)
@@ -100,6 +271,49 @@ def init() -> NessusAPI:
 
     return nessus
 
+def run_pool_command(args: argparse.Namespace, session_options: dict, profiler: Optional['Profiler'] = None) -> 'NessusPool':
+    # configs with a "servers" list spread the scans over several scanners (see pool.py)
+    from pool import NessusPool
+    pool = NessusPool(args.config, **session_options)
+
+    if profiler:
+        for node in pool.nodes:
+            profiler.instrument_session(node.Nessus._session)
+
+    if args.command == "init":
+        plans = pool.reconcile(dry_run=args.dry_run)
+        for server, steps in plans.items():
+            print(f"{server}:")
+            print_plan(steps, dry_run=args.dry_run)
+        if args.exec and not args.dry_run:
+            run_pool_scans(pool, {server: [step['id'] for step in steps if step['type'] == 'scan' and step['id']]
+                                  for server, steps in plans.items()}, args)
+    elif args.command == "exec":
+        if not (args.folder or args.scan):
+            raise ArgumentError(None, "Specify scans to execute with --folder and/or --scan")
+        run_pool_scans(pool, {server: [scan['id'] for scan in scans]
+                              for server, scans in pool.find_scans(args.scan, args.folder).items()}, args)
+
+    elif args.command == "export":
+        failures = pool.export_all_scans(args.outdir, export_formats=[f.lower() for f in args.format],
+                                         scan_folder=args.scan_folder, workers=args.workers,
+                                         incremental=args.incremental, prune=args.prune)
+        if failures:
+            print(f"{len(failures)} export(s) failed")
+
+    elif args.command == 'watch':
+        # nodes without the folder have nothing to watch
+        watch([node for node, here in zip(pool.nodes, pool.has_folder(args.folder))
+               if here] if args.folder else pool.nodes, args)
+
+    elif args.command == 'interact':
+        interact(pool.nodes[0], pool)
+
+    else:
+        raise ArgumentError(None, "Unsupported Command") # control never reaches here
+
+    return pool
+
 
 if __name__ == "__main__":
     nessus = None
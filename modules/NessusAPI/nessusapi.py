@@ -1,16 +1,68 @@
-from tenable.nessus import Nessus
 import json
-import requests
 import os
-from getpass import getuser, getpass
-from subprocess import run
-from typing import Optional
-from pprint import pprint
+from collections import defaultdict
+from copy import deepcopy
+from hashlib import sha256
+from io import BytesIO
+from threading import Lock, RLock
+from getpass import getpass
+from typing import Optional, TYPE_CHECKING
+from manifest import ExportManifest, MANIFEST_NAME, export_filename, export_names, file_sha256
+from jobs import JobGraph
+import nessusparser
+import sshkeys
+from targets import TargetSet, shard_scans
+
+# pyTenable/requests take most of the startup time, so they are only imported once a command
+# actually connects to Nessus (see __login_user_passwd and _configure_session)
+if TYPE_CHECKING:
+    from tenable.nessus import Nessus
+
+# output files produced for each export format: (filename suffix, export_scan kwargs)
+# nessus.scans.export_scan(id, format=pdf, template_id=49) #DVL by plugin
+# nessus.scans.export_scan(id, format=pdf, template_id=48) #DVL by host w/remediation
+# nessus.scans.export_scan(id, format=pdf, template_id=47) #DVL by host
+# nessus.scans.export_scan(id, format=pdf, template_id=46) #DVL by host w/remediation
+# nessus.scans.export_scan(id, format=csv) # BUG: does not export with all columns
+# csv/jsonl are converted locally from the .nessus export instead (see nessusparser)
+EXPORT_FORMATS = {
+    'nessus': [('.nessus', {})],
+    'pdf': [('_dvl_by_host.pdf', {'format': 'pdf', 'template_id': 48}),
+            ('_dvl_by_plugin.pdf', {'format': 'pdf', 'template_id': 46})],
+    'csv': [('.csv', {'convert': 'csv'})],
+    'jsonl': [('.jsonl', {'convert': 'jsonl'})],
+}
+
+# scan statuses that occupy a slot on the scanner
+ACTIVE_STATUSES = ('pending', 'running', 'processing', 'resuming', 'pausing', 'stopping', 'publishing')
+
+# nodes of a NessusPool share one state file, keyed by server
+STATE_LOCK = Lock()
+
+# imported policies carry a fingerprint of their config entry in the description so reconcile() can
+# tell an unchanged policy apart from an edited one without downloading it
+FINGERPRINT_TAG = 'nessusapi-fingerprint:'
+# and a hash of the policy file alone, so policies sharing a file can be copied server-side from any
+# one of them instead of uploading and importing the same XML again
+CONTENT_TAG = 'nessusapi-content:'
 
 def parse_config(file: str) -> dict:
     with open(file, encoding='utf-8') as file:
         return json.loads(file.read())
 
+def policy_fingerprint(policy: dict) -> str:
+    digest = sha256()
+    with open(policy['file'], 'rb') as policyfile:
+        digest.update(policyfile.read())
+    digest.update(json.dumps([policy['name'], policy.get('credentials')], sort_keys=True).encode())
+    return digest.hexdigest()
+
+def scan_fingerprint(scan: dict, policy_fingerprints: dict[str, str]) -> str:
+    # a scan also changes when the config policy it references is re-imported
+    settings = {k: scan.get(k) for k in ('name', 'description', 'folder', 'policy', 'targets', 'enabled')}
+    settings['policy_fingerprint'] = policy_fingerprints.get(scan['policy'])
+    return sha256(json.dumps(settings, sort_keys=True).encode()).hexdigest()
+
 class NessusAPI():
     def __init__(self,
                  file: Optional[str] = None,
@@ -18,17 +70,45 @@ class NessusAPI():
                  port: Optional[int] = None,
                  tokens: Optional[dict[str,str]] = None,
                  credentials: Optional[dict[str,str]] = None,
-                 initialize: bool = False) -> None:
+                 initialize: bool = False,
+                 state_file: Optional[str] = None,
+                 workers: int = 4,
+                 pool_size: Optional[int] = None,
+                 retries: int = 3,
+                 timeout: Optional[float] = 300,
+                 key_cache: Optional[dict[str, bytes]] = None,
+                 key_errors: Optional[dict[str, str]] = None) -> None:
+        # name -> record indexes of server metadata, filled lazily by _metadata_index()
+        self._metadata = {}
+        self._metadata_lock = RLock()
+        # remote SSH keys already collected ("host:/path" -> key), shared by the nodes of a NessusPool
+        self.key_cache = {} if key_cache is None else key_cache
+        # remote SSH keys that could not be collected ("host:/path" -> error), not fetched again
+        self.key_errors = {} if key_errors is None else key_errors
         config = None
         if file:
             config = parse_config(file)
-            server_config = config['server']
-            host = server_config['host']
-            port = server_config['port']
+            # host/port/credentials given explicitly win over the config's server (pool configs have none)
+            server_config = config.get('server') or {}
+            host = host or server_config.get('host')
+            port = port or server_config.get('port')
             if not tokens:
                 tokens = server_config.get('tokens')
             if not credentials:
                 credentials = server_config.get('credentials')
+            if not state_file:
+                state_file = f"{os.path.splitext(file)[0]}.state.json"
+        # fingerprints of the scans created by reconcile(), keyed by server then scan id
+        self.state_file = state_file
+        # upper bound on concurrent API jobs for init/export
+        self.workers = workers
+        # every call shares one keep-alive connection pool sized for the concurrency in use
+        self.pool_size = pool_size or max(workers, 10)
+        self.retries = retries
+        self.timeout = timeout
+        if not host:
+            raise KeyError("No Nessus host given (configs with a 'servers' list are used through NessusPool)")
+        self.server = f'{host}:{port}'
         if tokens:
             self.Nessus = self.__login_token(host, port, tokens)
         elif credentials:
@@ -36,155 +116,489 @@ class NessusAPI():
         else:
             raise KeyError("Credentials or Token not provided or missing in config file.")
 
-        if config and initialize:    
-            self._setup_import_policies(config.get('policies'))
-            self._setup_scans(config.get('scans'))
+        if config and initialize:
+            self.reconcile(config)
 
     def logout(self):
         self.Nessus._deauthenticate()
 
-    def __login_user_passwd(self, host: str, port: int, credentials: dict[str,str]) -> Nessus:
+    def __login_user_passwd(self, host: str, port: int, credentials: dict[str,str]) -> 'Nessus':
+        from tenable.nessus import Nessus
         username = input('Username: ') if credentials.get('username', '*') == "*" else credentials['username']
         password = getpass("Password: ") if credentials.get('password', '*') == "*" else credentials['password']
-        return Nessus(url = f'https://{host}:{port}', username=username, password=password)
+        # pyTenable has its own retry loop (5 retries, any method) on top of the adapter, turn it off so
+        # the Retry mounted below is the only retry policy
+        nessus = Nessus(url = f'https://{host}:{port}', username=username, password=password, timeout=self.timeout,
+                        retries=0)
+        self._configure_session(nessus._session)
+        return nessus
+
+    def _configure_session(self, session) -> None:
+        from requests.adapters import HTTPAdapter
+        from urllib3.util.retry import Retry
+        # connection failures are retried for any request since nothing reached the server; 5xx responses
+        # and read errors only for the idempotent methods in allowed_methods (urllib3 re-raises read errors
+        # for the rest), and no other errors at all, so an import or launch is never sent twice
+        retry = Retry(total=self.retries, connect=self.retries, read=self.retries, status=self.retries, other=0,
+                      backoff_factor=0.5, status_forcelist=(500, 502, 503, 504),
+                      allowed_methods=Retry.DEFAULT_ALLOWED_METHODS, raise_on_status=False)
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size, max_retries=retry)
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
 
-    def __login_token(self, host: str, port: int, tokens: dict[str,str]) -> Nessus:
+    def __login_token(self, host: str, port: int, tokens: dict[str,str]) -> 'Nessus':
         raise NotImplementedError()
 
-    def _setup_scans(self, scans: list[dict]) -> None:
-        for scan in scans:
-            self.create_scan(scan)
-
-    def _setup_import_policies(self, policies: list[dict]) -> None:
-        for policy in policies:
-            self.import_policy(policy)
-
-    def _get_policy_id_by_name(self, name: str) -> dict:
-        policies = self.Nessus.policies.list()
-        for p in policies:
-            if p['name'] == name:
-                # template_uuid, name, and id are the primary keys
-                return p, 'policy'
-        builtin_policies = self.Nessus.editor.template_list('policy')
-        for p in builtin_policies:
+    def _load_state(self) -> dict[str, str]:
+        if not self.state_file:
+            return {}
+        # pool nodes share the state file, hold the lock so no node reads it while another replaces it
+        with STATE_LOCK:
+            if not os.path.exists(self.state_file):
+                return {}
+            with open(self.state_file, encoding='utf-8') as file:
+                return json.loads(file.read()).get(self.server, {})
+
+    def _save_state(self, scan_state: dict[str, str]) -> None:
+        if not self.state_file:
+            return
+        with STATE_LOCK:
+            state = {}
+            if os.path.exists(self.state_file):
+                with open(self.state_file, encoding='utf-8') as file:
+                    state = json.loads(file.read())
+            state[self.server] = scan_state
+            tmp_path = f"{self.state_file}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as file:
+                file.write(json.dumps(state, indent=2))
+            os.replace(tmp_path, self.state_file)
+
+    def plan(self, config: dict) -> list[dict]:
+        # compare the config's policies and scans with the server and return one step per entry:
+        # { 'action': 'create' | 'update' | 'keep', 'type': 'policy' | 'scan', 'name', 'config', 'id', 'fingerprint' }
+        steps = []
+        policy_fingerprints = {}
+        contents = {}
+        live_policies = self._metadata_index('policies')
+        for policy in config.get('policies') or []:
+            fingerprint = policy_fingerprints[policy['name']] = policy_fingerprint(policy)
+            if policy['file'] not in contents:
+                contents[policy['file']] = file_sha256(policy['file'])
+            live = live_policies.get(policy['name'])
+            if not live:
+                action = 'create'
+            elif f"{FINGERPRINT_TAG}{fingerprint}" in (live.get('description') or ''):
+                action = 'keep'
+            else:
+                action = 'update'
+            steps.append({'action': action, 'type': 'policy', 'name': policy['name'], 'config': policy,
+                          'id': live['id'] if live else None, 'fingerprint': fingerprint,
+                          'content': contents[policy['file']]})
+
+        # scans are matched by folder and name. Nessus does not return scan settings in the scan list,
+        # so an existing scan is only left alone if the state file recorded the same fingerprint for it
+        scan_state = self._load_state()
+        listing = self.Nessus.scans.list()
+        folder_names = {folder['id']: folder['name'] for folder in listing['folders'] or []}
+        live_scans = defaultdict(list)
+        for scan in sorted(listing['scans'] or [], key=lambda scan: scan['id']):
+            live_scans[(folder_names.get(scan['folder_id']), scan['name'])].append(scan)
+        # scans with "shards": N are planned as N scans, each with an equal share of the targets
+        for scan in shard_scans(config.get('scans') or []):
+            fingerprint = scan_fingerprint(scan, policy_fingerprints)
+            matches = live_scans[(scan['folder'], scan['name'])]
+            live = matches.pop(0) if matches else None
+            if not live:
+                action = 'create'
+            elif scan_state.get(str(live['id'])) == fingerprint:
+                action = 'keep'
+            else:
+                action = 'update'
+            steps.append({'action': action, 'type': 'scan', 'name': scan['name'], 'config': scan,
+                          'id': live['id'] if live else None, 'fingerprint': fingerprint})
+        return steps
+
+    def _apply_policy(self, step: dict, keys: dict[str, bytes], key_errors: dict[str, str], source: Optional[int] = None) -> int:
+        # an updated policy is replaced only once its new version is in place, a failed import keeps the old one
+        policy_id = self.import_policy(step['config'], fingerprint=step['fingerprint'], keys=keys, key_errors=key_errors,
+                                       content=step['content'], source=source)['id']
+        if step['action'] == 'update':
+            self.delete_policy(step['id'])
+        return policy_id
+
+    def _apply_scan(self, step: dict) -> int:
+        if step['action'] == 'create':
+            return self.create_scan(step['config'])['scan']['id']
+        self.update_scan(step['id'], step['config'])
+        return step['id']
+
+    def apply(self, steps: list[dict]) -> dict[str, Exception]:
+        # runs the plan as a job graph: each distinct policy file is imported once (or not at all when a
+        # server policy already holds it) and every other policy using it is a server-side copy, folders
+        # are created once each, and every scan starts as soon as the folder and config policy it
+        # references exist. failed steps get an 'error' and the errors are returned keyed by job name
+        graph = JobGraph(self.workers)
+        step_jobs = {}
+        policy_jobs = {}
+        folder_jobs = {}
+        policy_steps = [s for s in steps if s['type'] == 'policy' and s['action'] != 'keep']
+        # remote SSH keys are all collected before any import; a policy missing a key fails on its own
+        keys, key_errors = self.collect_sshkeys([step['config'] for step in policy_steps])
+        # policies replaced in this run can't be copied, they are deleted after their re-import
+        replaced = {step['id'] for step in policy_steps if step['action'] == 'update'}
+        sources = {}
+        if policy_steps:
+            for live in self._metadata_index('policies').values():
+                for content in {step['content'] for step in policy_steps}:
+                    if live['id'] not in replaced and f"{CONTENT_TAG}{content}" in (live.get('description') or ''):
+                        sources.setdefault(content, live['id'])
+
+        def copy_policy(step: dict, import_job: str) -> int:
+            return self._apply_policy(step, keys, key_errors, graph.results[import_job])
+
+        import_jobs = {}
+        for step in policy_steps:
+            name = f"policy:{step['name']}"
+            if step['content'] in sources:
+                job = graph.add(name, self._apply_policy, step, keys, key_errors, sources[step['content']])
+            elif step['content'] in import_jobs:
+                job = graph.add(name, copy_policy, step, import_jobs[step['content']], deps=[import_jobs[step['content']]])
+            else:
+                job = import_jobs[step['content']] = graph.add(name, self._apply_policy, step, keys, key_errors)
+            policy_jobs[step['name']] = job
+            step_jobs[job] = step
+        for n, step in enumerate([s for s in steps if s['type'] == 'scan' and s['action'] != 'keep']):
+            folder = step['config']['folder']
+            if folder not in folder_jobs:
+                folder_jobs[folder] = graph.add(f"folder:{folder}", self._get_folder_id, folder)
+            job = graph.add(f"scan:{n}:{step['name']}", self._apply_scan, step,
+                            deps=[folder_jobs[folder], policy_jobs.get(step['config']['policy'])])
+            step_jobs[job] = step
+        if not graph.jobs:
+            return {}
+        # fill the metadata cache up front instead of from several workers at once
+        for kind in ('folders', 'policies', 'templates'):
+            self._metadata_index(kind)
+
+        def on_done(job: str, error: Optional[Exception]) -> None:
+            if job in step_jobs:
+                step = step_jobs[job]
+                if error:
+                    step['error'] = error
+                else:
+                    step['id'] = graph.results[job]
+
+        scan_state = self._load_state()
+        try:
+            errors = graph.run(on_done)
+        finally:
+            for step in [s for s in steps if s['type'] == 'scan' and s['id'] and not s.get('error')]:
+                scan_state[str(step['id'])] = step['fingerprint']
+            self._save_state(scan_state)
+        return errors
+
+    def reconcile(self, config: dict, dry_run: bool = False) -> list[dict]:
+        steps = self.plan(config)
+        if not dry_run:
+            self.apply(steps)
+        return steps
+
+    def refresh_metadata(self, kind: Optional[str] = None) -> None:
+        # re-read folders/policies/templates from the server (all of them when kind is None)
+        fetchers = {
+            'folders': self.Nessus.folders.list,
+            'policies': self.Nessus.policies.list,
+            'templates': lambda: self.Nessus.editor.template_list('policy'),
+        }
+        for k in ([kind] if kind else fetchers):
+            records = fetchers[k]() or []
+            with self._metadata_lock:
+                self._metadata[k] = {record['name']: record for record in records}
+
+    def invalidate_metadata(self, kind: Optional[str] = None) -> None:
+        with self._metadata_lock:
+            if kind:
+                self._metadata.pop(kind, None)
+            else:
+                self._metadata.clear()
+
+    def _metadata_index(self, kind: str) -> dict[str, dict]:
+        with self._metadata_lock:
+            if kind not in self._metadata:
+                self.refresh_metadata(kind)
+            return self._metadata[kind]
+
+    def _get_policy_id_by_name(self, name: str) -> tuple[dict, str]:
+        # template_uuid, name, and id are the primary keys
+        policy = self._metadata_index('policies').get(name)
+        if policy:
+            return policy, 'policy'
+        for p in self._metadata_index('templates').values():
             if p['name'] in name or p['title'] in name:
-                # template_uuid, name, and id are the primary keys
                 return p, 'template'
+        raise KeyError(f"No policy or template found matching '{name}'")
+
+    def _get_folder_id(self, name: str) -> int:
+        folder = self._metadata_index('folders').get(name)
+        return folder['id'] if folder else self.create_folder(name)
 
     def list_folders(self) -> list[dict]:
         return self.Nessus.folders.list()
 
-    def list_scans(self, folder_name: Optional[int] = None) -> dict:
+    def list_scans(self, folder_name: Optional[str] = None) -> list[dict]:
         scans = self.Nessus.scans.list()
         if not folder_name:
-            return scans['scans']
+            return scans['scans'] or []
         else:
             folder_id = {folder['name']:folder['id'] for folder in scans['folders']}[folder_name]
-            return self.Nessus.scans.list(folder_id)
+            return self.Nessus.scans.list(folder_id)['scans'] or []
 
     def list_policies(self) -> dict:
         return self.Nessus.policies.list()
 
 
     def create_folder(self, name: str) -> int:
-        return self.Nessus.folders.create(name)
+        folder_id = self.Nessus.folders.create(name)
+        with self._metadata_lock:
+            if 'folders' in self._metadata:
+                self._metadata['folders'][name] = {'id': folder_id, 'name': name, 'type': 'custom'}
+        return folder_id
 
-    def create_scan(self, settings: dict) -> dict:
+    def _scan_request(self, settings: dict) -> tuple[str, dict]:
+        # template uuid and settings for creating/updating a scan from its config entry
         scan_policy, scan_type = self._get_policy_id_by_name(settings['policy'])
-        scan_folders = {folder['name']:folder['id'] for folder in self.list_folders()}
-        scan_folder_id = scan_folders.get(settings['folder'])
-        if not scan_folder_id:
-            scan_folder_id = self.create_folder(settings['folder'])
-        
-        if scan_type == 'template':
-            return self.Nessus.scans.create(uuid = scan_policy['uuid'], settings = {
-                'name': settings['name'],
-                'enabled': settings.get('enabled', False),
-                'text_targets': ', '.join(settings['targets']),
-                'folder_id': scan_folder_id,
-            })
+        scan_settings = {
+            'name': settings['name'],
+            'enabled': settings.get('enabled', False),
+            'text_targets': TargetSet(settings['targets']).text(),
+            'folder_id': self._get_folder_id(settings['folder']),
+        }
+        if settings.get('description'):
+            scan_settings['description'] = settings['description']
 
+        if scan_type == 'template':
+            return scan_policy['uuid'], scan_settings
         elif scan_type == 'policy':
-            return self.Nessus.scans.create(uuid = scan_policy['template_uuid'], settings = {
-                'name': settings['name'],
-                'enabled': settings.get('enabled', False),
-                'text_targets': ', '.join(settings['targets']),
-                'policy_id': scan_policy['id'],
-                'folder_id': scan_folder_id,
-            })
+            return scan_policy['template_uuid'], {**scan_settings, 'policy_id': scan_policy['id']}
         else:
             raise ValueError(f"{scan_type}, {scan_policy}")
 
+    def create_scan(self, settings: dict) -> dict:
+        uuid, scan_settings = self._scan_request(settings)
+        return self.Nessus.scans.create(uuid = uuid, settings = scan_settings)
+
+    def update_scan(self, scan_id: int, settings: dict) -> None:
+        uuid, scan_settings = self._scan_request(settings)
+        self.Nessus.put(f'scans/{scan_id}', json={'uuid': uuid, 'settings': scan_settings})
+
+    def delete_policy(self, policy_id: int) -> None:
+        self.Nessus.policies.delete(policy_id)
+        with self._metadata_lock:
+            for name, policy in list(self._metadata.get('policies', {}).items()):
+                if policy['id'] == policy_id:
+                    del self._metadata['policies'][name]
+
     def add_credentials(self, uuid: str, id: int, credentials: dict) -> None:
-        response = requests.put(f'{self.Nessus._url}/policies/{id}', verify=False,
-        json={"uuid":uuid,  **credentials},
-        headers={"X-Cookie": self.Nessus._session.headers['X-Cookie'], "Content-Type": "application/json"})
-        if response.status_code != 200:
-            response.raise_for_status()
+        self.Nessus.put(f'policies/{id}', json={"uuid":uuid,  **credentials})
 
-    def import_policy(self, policy: dict) -> dict:
+    def collect_sshkeys(self, policies: list[dict]) -> tuple[dict[str, bytes], dict[str, str]]:
+        # fetch the remote SSH private keys of the policies that are not in key_cache (or key_errors) yet,
+        # each source host once and concurrently. returns every key of the cache and every failed key
+        keys, errors = sshkeys.collect_keys(policies, self.workers, skip=self.key_cache.keys() | self.key_errors.keys())
+        self.key_cache.update(keys)
+        self.key_errors.update(errors)
+        return dict(self.key_cache), dict(self.key_errors)
+
+    def import_policy(self, policy: dict, fingerprint: Optional[str] = None, keys: Optional[dict[str, bytes]] = None,
+                      content: Optional[str] = None, source: Optional[int] = None,
+                      key_errors: Optional[dict[str, str]] = None) -> dict:
+        # keys maps "host:/path" private keys to their contents and key_errors the ones that failed (both
+        # from collect_sshkeys); remote keys in neither are collected here. source is the id of a server
+        # policy imported from the same file (content hash), it is copied instead of uploading the file again
         def __import_sshkeys(credentials: dict) -> dict:
-            try:
-                for idx, ssh_creds in enumerate(credentials["Host"]["SSH"]):
-                    if ssh_creds['auth_method'] == 'public_key':
-                        key_path = ssh_creds['private_key'].split(':')
-                        if len(key_path) == 2: # scp key if not local
-                            key_path = f"/tmp/{key_path[1]}_{ssh_creds['username']}_id_rsa"
-                            cmd_result = run(f"echo '{ssh_creds['password']}' | scp -q -o StrictHostKeyChecking=no {ssh_creds['username']}@{ssh_creds['private_key']} {key_path}")
-                            del ssh_creds['password'] # delete initial login password after use
-                            os.remove(key_path) # delete downloaded key after use
-                            if cmd_result.returncode:
-                                raise OSError("Could not download SSH Private Key from ")
-                        else:
-                            key_path = key_path[0]
-                        with open(key_path, 'rb') as keyfile:
-                            credentials["Host"]["SSH"][idx]["private_key"] = self.Nessus.files.upload(keyfile)
-            except KeyError: 
-                pass
+            credentials = deepcopy(credentials)
+            ssh_credentials = (credentials or {}).get("Host", {}).get("SSH", [])
+            remote = [c['private_key'] for c in ssh_credentials
+                      if c.get('auth_method') in sshkeys.PUBLIC_KEY_AUTH and ':' in c.get('private_key', '')]
+            collected, errors = dict(keys or {}), dict(key_errors or {})
+            if any(key not in collected and key not in errors for key in remote):
+                fetched, fetch_errors = self.collect_sshkeys([{'credentials': credentials}])
+                collected.update(fetched)
+                errors.update(fetch_errors)
+            errors = {key: errors.get(key, 'not collected') for key in remote if key not in collected}
+            if errors:
+                raise sshkeys.KeyCollectionError(errors)
+            for ssh_creds in ssh_credentials:
+                if ssh_creds.get('auth_method') not in sshkeys.PUBLIC_KEY_AUTH:
+                    continue
+                if ssh_creds['private_key'] in collected: # upload fetched key straight from memory
+                    keyfile = BytesIO(collected[ssh_creds['private_key']])
+                    keyfile.name = f"{ssh_creds['username']}_id_rsa"
+                    ssh_creds.pop('password', None) # delete initial login password after use
+                    ssh_creds["private_key"] = self.Nessus.files.upload(keyfile)
+                else:
+                    with open(ssh_creds['private_key'], 'rb') as keyfile:
+                        ssh_creds["private_key"] = self.Nessus.files.upload(keyfile)
             return { "credentials": { "add": credentials } }
 
         imported_policy_id = None
-        with open(policy['file'], 'rb') as policyfile:
-            imported_policy_id = self.Nessus.policies.import_policy(policyfile)['id']
+        if source:
+            imported_policy_id = self.Nessus.policies.copy(source)['id']
+        else:
+            with open(policy['file'], 'rb') as policyfile:
+                imported_policy_id = self.Nessus.policies.import_policy(policyfile)['id']
         imported_policy = self.Nessus.policies.details(imported_policy_id)
         imported_policy['settings']['name'] = policy['name']
+        tags = [f"{FINGERPRINT_TAG}{fingerprint}" if fingerprint else '', f"{CONTENT_TAG}{content}" if content else '']
+        if any(tags):
+            imported_policy['settings']['description'] = ' '.join(tag for tag in tags if tag)
         self.Nessus.policies.edit(imported_policy_id, **imported_policy)
-        # import credentials last
+        # import credentials last, a copy's credentials are replaced by the ones in the config
         credentials = __import_sshkeys(policy['credentials'])
+        if source:
+            credentials['credentials']['delete'] = list((imported_policy.get('credentials') or {}).get('edit') or {})
         self.add_credentials(imported_policy['uuid'], imported_policy_id, credentials)
+        with self._metadata_lock:
+            if 'policies' in self._metadata:
+                self._metadata['policies'][policy['name']] = {
+                    'id': imported_policy_id,
+                    'name': policy['name'],
+                    'template_uuid': imported_policy['uuid'],
+                    'description': imported_policy['settings'].get('description'),
+                }
+        imported_policy['id'] = imported_policy_id
         return imported_policy
     
-    # def run_scan(scan_name: str, folder_name: Optional[str] = None) -> None:
-    #     pass
+    def find_scans(self, names: Optional[list[str]] = None, folder_name: Optional[str] = None) -> list[dict]:
+        scans = self.list_scans(folder_name)
+        if names:
+            scans = [scan for scan in scans if scan['name'] in names]
+            missing = set(names) - {scan['name'] for scan in scans}
+            if missing:
+                raise KeyError(f"Scans not found: {', '.join(sorted(missing))}")
+        return scans
 
-    # def run_all_scans() -> None:
-    #     pass
+    def run_scan(self, scan_name: str, folder_name: Optional[str] = None) -> list[str]:
+        return [self.Nessus.scans.launch(scan['id']) for scan in self.find_scans([scan_name], folder_name)]
 
-    # def stop_scan(scan_name: str, folder_name: Optional[str] = None) -> None:
-    #     pass
+    def run_all_scans(self, folder_name: Optional[str] = None) -> list[str]:
+        return [self.Nessus.scans.launch(scan['id']) for scan in self.find_scans(folder_name=folder_name)]
 
-    # def stop_all_scans() -> None:
-    #     pass
+    def stop_scan(self, scan_name: str, folder_name: Optional[str] = None) -> None:
+        for scan in self.find_scans([scan_name], folder_name):
+            self.Nessus.scans.stop(scan['id'])
 
-    def export_scan(self, scan_id: int, outfile: str):
-        with open(outfile, 'wb') as file:
-            self.Nessus.scans.export_scan(scan_id, fobj=file)
+    def stop_all_scans(self, folder_name: Optional[str] = None) -> None:
+        for scan in self.find_scans(folder_name=folder_name):
+            if scan['status'] in ACTIVE_STATUSES:
+                self.Nessus.scans.stop(scan['id'])
 
-    def export_all_scans(self, outdir: str, scan_folder: str = None, export_formats: list[str] = ['nessus']):
-        # nessus.scans.export_scan(id, format=pdf, template_id=49) #DVL by plugin
-        # nessus.scans.export_scan(id, format=pdf, template_id=48) #DVL by host w/remediation
-        # nessus.scans.export_scan(id, format=pdf, template_id=47) #DVL by host
-        # nessus.scans.export_scan(id, format=pdf, template_id=46) #DVL by host w/remediation
-        # nessus.scans.export_scan(id, format=csv) # BUG: does not export with all columns
+    def export_scan(self, scan_id: int, outfile: str, **kwargs) -> None:
+        # download to a partial file so an interrupted export never looks complete
+        partfile = f"{outfile}.part"
+        with open(partfile, 'wb') as file:
+            self.Nessus.scans.export_scan(scan_id, fobj=file, **kwargs)
+        os.replace(partfile, outfile)
+
+    def convert_scan(self, scan_id: int, outfile: str, convert: str, source: Optional[str] = None) -> None:
+        # convert a downloaded .nessus file (or a fresh temporary export) into a full-column format
+        if source:
+            nessusparser.convert(source, outfile, convert)
+            return
+        source = f"{outfile}.nessus"
+        try:
+            self.export_scan(scan_id, source)
+            nessusparser.convert(source, outfile, convert)
+        finally:
+            if os.path.exists(source):
+                os.remove(source)
+
+    def _export_jobs(self, scans: list[dict], outdir: str, export_formats: list[str], names: dict[int, str]) -> list[tuple]:
+        # one job per scan and output file so that every export builds on the server independently
+        jobs = []
+        for scan in scans:
+            for fmt in export_formats:
+                if fmt not in EXPORT_FORMATS:
+                    raise ValueError(f"Unsupported export format: '{fmt}'")
+                for suffix, kwargs in EXPORT_FORMATS[fmt]:
+                    jobs.append((scan, fmt, suffix, os.path.join(outdir, export_filename(names[scan['id']], suffix)), kwargs))
+        return jobs
+
+    def export_scans(self, scans: list[dict], outdir: str, export_formats: list[str] = ['nessus'], workers: Optional[int] = None,
+                     manifest: Optional[ExportManifest] = None, names: Optional[dict[int, str]] = None) -> list[tuple]:
+        # up to `workers` exports are requested at once so Nessus keeps building reports while finished
+        # files download. failed jobs are returned as (scan, format, outfile, exception) instead of raising.
+        # scans already current in `manifest` are skipped. files are named by `names` (see export_names)
         if not os.path.exists(outdir):
-            os.mkdir(outdir, mode=755)
+            os.mkdir(outdir, mode=0o755)
         if not  os.path.isdir(outdir):
             raise FileExistsError(f"Cannot use '{outdir}' to store scans")
-        
-        for scan in self.list_scans(scan_folder):
-            if scan['status'] in "completed imported":
-                if 'nessus' in export_formats:
-                    self.export_scan(scan['id'], outfile=os.path.join(outdir, f"{scan['name']}.nessus"))
-                if 'pdf' in export_formats:
-                    self.export_scan(scan['id'], outfile=os.path.join(outdir, f"{scan['name']}_dvl_by_host.pdf"), format='pdf', template_id=48)
-                    self.export_scan(scan['id'], outfile=os.path.join(outdir, f"{scan['name']}_dvl_by_plugin.pdf"), format='pdf', template_id=46)
+
+        names = names or export_names(scans)
+        jobs = self._export_jobs(scans, outdir, export_formats, names)
+        if manifest:
+            skipped = len(jobs)
+            jobs = [job for job in jobs if not manifest.is_current(job[0], job[2], names[job[0]['id']])]
+            print(f"{skipped - len(jobs)} export(s) already up to date")
+
+        graph = JobGraph(workers or self.workers)
+        export_jobs = {}
+        for scan, fmt, suffix, outfile, kwargs in sorted(jobs, key=lambda job: 'convert' in job[4]):
+            job = f"{scan['id']}:{suffix}"
+            if 'convert' in kwargs:
+                # reuse the .nessus file of this export, or the one already on disk when it is current
+                nessus_job = f"{scan['id']}:.nessus"
+                nessus_file = os.path.join(outdir, export_filename(names[scan['id']], '.nessus'))
+                if nessus_job in graph.jobs:
+                    graph.add(job, self.convert_scan, scan['id'], outfile, kwargs['convert'], source=nessus_file, deps=[nessus_job])
+                elif manifest and manifest.is_current(scan, '.nessus', names[scan['id']]):
+                    graph.add(job, self.convert_scan, scan['id'], outfile, kwargs['convert'], source=nessus_file)
+                else:
+                    graph.add(job, self.convert_scan, scan['id'], outfile, kwargs['convert'])
+            else:
+                graph.add(job, self.export_scan, scan['id'], outfile, **kwargs)
+            export_jobs[job] = (scan, fmt, suffix, outfile)
+
+        failures = []
+        def on_done(job: str, error: Optional[Exception]) -> None:
+            scan, fmt, suffix, outfile = export_jobs[job]
+            done = len(graph.results) + len(graph.errors)
+            if error:
+                print(f"[{done}/{len(jobs)}] FAILED '{scan['name']}' ({fmt}): {error}")
+                failures.append((scan, fmt, outfile, error))
+                return
+            if manifest:
+                manifest.record(scan, fmt, suffix, names[scan['id']])
+            print(f"[{done}/{len(jobs)}] Exported '{scan['name']}' ({fmt}) to {outfile}")
+
+        try:
+            graph.run(on_done)
+        finally:
+            if manifest:
+                manifest.save()
+        return failures
+
+    def export_all_scans(self, outdir: str, scan_folder: str = None, export_formats: list[str] = ['nessus'], workers: Optional[int] = None,
+                         incremental: bool = False, prune: bool = False, manifest_name: str = MANIFEST_NAME,
+                         shared_names: set[str] = frozenset()) -> list[tuple]:
+        # incremental exports skip scans unchanged since the last export recorded in the outdir manifest.
+        # shared_names are the scan names other pool nodes export into the same outdir
+        live_scans = self.list_scans(scan_folder)
+        scans = [scan for scan in live_scans if scan['status'] in "completed imported"]
+        # file names come from every scan on the server so they don't depend on which scans are exported
+        if scan_folder:
+            live_scans = self.list_scans()
+        names = export_names(live_scans, self.server, shared_names)
+
+        manifest = None
+        if incremental:
+            if not os.path.exists(outdir):
+                os.mkdir(outdir, mode=0o755)
+            manifest = ExportManifest(outdir, manifest_name)
+            for scan in scans:
+                for old_file, new_file in manifest.rename(scan, names[scan['id']]):
+                    print(f"Renamed {old_file} to {new_file}")
+            for entry in manifest.prune({scan['id'] for scan in live_scans}, delete_files=prune):
+                print(f"Scan '{entry['name']}' no longer exists on the server{' (removed files)' if prune else ''}")
+
+        return self.export_scans(scans, outdir, export_formats, workers=workers, manifest=manifest, names=names)
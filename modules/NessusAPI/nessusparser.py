@@ -0,0 +1,122 @@
+import csv
+import json
+import os
+from tempfile import TemporaryFile
+from typing import Iterator
+from xml.etree.ElementTree import iterparse
+
+# host properties copied onto every finding, renamed to csv friendly columns
+HOST_FIELDS = {
+    'host-ip': 'host_ip',
+    'host-fqdn': 'host_fqdn',
+    'netbios-name': 'netbios_name',
+    'mac-address': 'mac_address',
+    'operating-system': 'operating_system',
+}
+
+# leading csv columns, the remaining ReportItem attributes/plugin fields follow in sorted order
+LEADING_COLUMNS = ['report', 'host', *HOST_FIELDS.values(), 'port', 'protocol', 'svc_name',
+                   'severity', 'pluginID', 'pluginName', 'pluginFamily', 'risk_factor', 'cve']
+
+# plugin fields that can appear more than once in a ReportItem; these are always lists so every
+# finding has the same type for them, even with a single (or no other) occurrence
+REPEATED_FIELDS = ('bid', 'cert', 'cisa-known-exploited', 'cve', 'cwe', 'edb-id', 'iava', 'iavb', 'iavt',
+                   'msft', 'mskb', 'osvdb', 'see_also', 'xref')
+
+def iter_findings(path: str) -> Iterator[dict]:
+    # Stream the ReportItems of a .nessus file as flat dicts: the host name and properties from
+    # HOST_FIELDS, every ReportItem attribute, and every plugin field (child element). Fields that
+    # repeat (REPEATED_FIELDS, and any other field seen twice) are lists. Elements are removed from
+    # the tree once they are read so memory stays bounded by a single host, not by the size of the file.
+    report = None
+    host = None
+    host_properties = {}
+    stack = []
+    for event, elem in iterparse(path, events=('start', 'end')):
+        if event == 'start':
+            stack.append(elem)
+            if elem.tag == 'Report':
+                report = elem.get('name')
+            elif elem.tag == 'ReportHost':
+                host = elem.get('name')
+                host_properties = {}
+            continue
+
+        stack.pop()
+        if elem.tag == 'tag' and stack and stack[-1].tag == 'HostProperties':
+            if elem.get('name') in HOST_FIELDS:
+                host_properties[HOST_FIELDS[elem.get('name')]] = (elem.text or '').strip()
+        elif elem.tag == 'HostProperties':
+            stack[-1].remove(elem)
+        elif elem.tag == 'ReportItem':
+            finding = {'report': report, 'host': host, **host_properties, **elem.attrib}
+            for field in elem:
+                value = (field.text or '').strip()
+                if field.tag in finding:
+                    if not isinstance(finding[field.tag], list):
+                        finding[field.tag] = [finding[field.tag]]
+                    finding[field.tag].append(value)
+                elif field.tag in REPEATED_FIELDS:
+                    finding[field.tag] = [value]
+                else:
+                    finding[field.tag] = value
+            stack[-1].remove(elem)
+            yield finding
+        elif elem.tag in ('ReportHost', 'Policy'):
+            stack[-1].remove(elem)
+
+def iter_hosts(path: str) -> Iterator[dict]:
+    # one record per host with its finding count per severity
+    current = None
+    for finding in iter_findings(path):
+        if not current or (current['report'], current['host']) != (finding['report'], finding['host']):
+            if current:
+                yield current
+            current = {'report': finding['report'], 'host': finding['host'],
+                       **{field: finding.get(field, '') for field in HOST_FIELDS.values()},
+                       'severity': {}}
+        severity = finding.get('severity', '0')
+        current['severity'][severity] = current['severity'].get(severity, 0) + 1
+    if current:
+        yield current
+
+def write_csv(path: str, outfile: str) -> int:
+    # columns are not known until every finding has been seen, so the findings are spooled to a
+    # temporary file while the columns are collected and written out from there. the spool goes next
+    # to the output (the export directory has room for it, /tmp may be a small tmpfs)
+    count = 0
+    seen = set()
+    with TemporaryFile('w+', encoding='utf-8', dir=os.path.dirname(outfile) or '.') as spool:
+        for finding in iter_findings(path):
+            seen.update(finding)
+            spool.write(json.dumps(finding) + '\n')
+        columns = [c for c in LEADING_COLUMNS if c in seen] + sorted(seen - set(LEADING_COLUMNS))
+        spool.seek(0)
+        with open(outfile, 'w', encoding='utf-8', newline='') as file:
+            writer = csv.DictWriter(file, fieldnames=columns)
+            writer.writeheader()
+            for line in spool:
+                finding = json.loads(line)
+                writer.writerow({k: '\n'.join(v) if isinstance(v, list) else v for k, v in finding.items()})
+                count += 1
+    return count
+
+def write_jsonl(path: str, outfile: str) -> int:
+    count = 0
+    with open(outfile, 'w', encoding='utf-8') as file:
+        for finding in iter_findings(path):
+            file.write(json.dumps(finding) + '\n')
+            count += 1
+    return count
+
+WRITERS = {
+    'csv': write_csv,
+    'jsonl': write_jsonl,
+}
+
+def convert(path: str, outfile: str, fmt: str) -> int:
+    # convert a .nessus file, writing to a partial file so an interrupted conversion never looks complete
+    partfile = f"{outfile}.part"
+    count = WRITERS[fmt](path, partfile)
+    os.replace(partfile, outfile)
+    return count
@@ -0,0 +1,132 @@
+import os
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional
+from nessusapi import NessusAPI, parse_config
+from manifest import MANIFEST_NAME
+from scheduler import ScanScheduler
+from targets import TargetSet, shard_scans
+
+# A config with a "servers" list instead of a "server" block drives several scanners as one pool:
+#   "servers": [ { "host": ..., "port": ..., "credentials": {...}, "weight": 2 }, ... ]
+# Every node gets all policies, every scan goes to exactly one node. A scan that already exists on a
+# node stays there; the others are assigned largest first (by host count) to the node with the least
+# hosts relative to its weight (LPT), so the nodes finish at about the same time. Sharded scans are
+# expanded first so their shards spread over the nodes.
+
+def manifest_name(node: NessusAPI) -> str:
+    # node exports share one directory, each node keeps its own manifest there
+    return MANIFEST_NAME.replace('.json', f".{node.server.replace(':', '_')}.json")
+
+class NessusPool():
+    def __init__(self, file: str, initialize: bool = False, **options) -> None:
+        self.config = parse_config(file)
+        servers = self.config.get('servers') or [self.config['server']]
+        self.weights = [max(float(server.get('weight', 1)), 0.01) for server in servers]
+        # remote SSH keys are fetched (or fail) once for the whole pool
+        key_cache, key_errors = {}, {}
+        # logins run one after another, they may prompt for a username/password
+        self.nodes = [NessusAPI(file=file, host=server['host'], port=server['port'], tokens=server.get('tokens'),
+                                credentials=server.get('credentials'), key_cache=key_cache,
+                                key_errors=key_errors, **options)
+                      for server in servers]
+        if initialize:
+            self.reconcile()
+
+    def logout(self) -> None:
+        for node in self.nodes:
+            node.logout()
+
+    def _map(self, fn: Callable, *node_args: list) -> list:
+        # fn(node, *args) on every node at once, taking the node's item of each node_args list.
+        # results are in node order
+        with ThreadPoolExecutor(max_workers=len(self.nodes)) as pool:
+            return list(pool.map(fn, self.nodes, *node_args))
+
+    def assign(self, scans: list[dict]) -> list[list[dict]]:
+        # config scans for each node, in node order
+        placed = {}
+        for n, listing in enumerate(self._map(lambda node: node.Nessus.scans.list())):
+            folder_names = {folder['id']: folder['name'] for folder in listing['folders'] or []}
+            for scan in listing['scans'] or []:
+                placed.setdefault((folder_names.get(scan['folder_id']), scan['name']), n)
+
+        assigned = [[] for _ in self.nodes]
+        load = [0] * len(self.nodes)
+        unplaced = []
+        for scan in shard_scans(scans):
+            size = len(TargetSet(scan['targets']))
+            n = placed.get((scan['folder'], scan['name']))
+            if n is None:
+                unplaced.append((size, scan))
+            else:
+                assigned[n].append(scan)
+                load[n] += size
+        for size, scan in sorted(unplaced, key=lambda item: item[0], reverse=True):
+            n = min(range(len(self.nodes)), key=lambda n: (load[n] + size) / self.weights[n])
+            assigned[n].append(scan)
+            load[n] += size
+        return assigned
+
+    def reconcile(self, config: Optional[dict] = None, dry_run: bool = False) -> dict[str, list[dict]]:
+        # plan every node, collect the SSH keys of all policies to import once, then apply the nodes
+        # concurrently. returns each node's steps keyed by server
+        config = config or self.config
+        node_configs = [{**config, 'scans': scans} for scans in self.assign(config.get('scans') or [])]
+        plans = self._map(NessusAPI.plan, node_configs)
+        if not dry_run:
+            policies = {step['name']: step['config'] for steps in plans for step in steps
+                        if step['type'] == 'policy' and step['action'] != 'keep'}
+            if policies:
+                self.nodes[0].collect_sshkeys(list(policies.values()))
+            self._map(NessusAPI.apply, plans)
+        return {node.server: steps for node, steps in zip(self.nodes, plans)}
+
+    def has_folder(self, folder_name: str) -> list[bool]:
+        # whether each node has the folder, in node order. a node without it just has no scans there,
+        # only a folder that no node has is an error
+        present = self._map(lambda node: any(folder['name'] == folder_name for folder in node.list_folders() or []))
+        if not any(present):
+            raise KeyError(f"Folder not found: '{folder_name}'")
+        return present
+
+    def find_scans(self, names: Optional[list[str]] = None, folder_name: Optional[str] = None) -> dict[str, list[dict]]:
+        # like NessusAPI.find_scans, but a name only has to exist on one of the nodes
+        present = self.has_folder(folder_name) if folder_name else [True] * len(self.nodes)
+        found = self._map(lambda node, here: [scan for scan in node.list_scans(folder_name) if not names or scan['name'] in names]
+                          if here else [], present)
+        missing = set(names or []) - {scan['name'] for scans in found for scan in scans}
+        if missing:
+            raise KeyError(f"Scans not found: {', '.join(sorted(missing))}")
+        return {node.server: scans for node, scans in zip(self.nodes, found)}
+
+    def shared_names(self) -> set[str]:
+        # scan names that more than one node has. nodes export into one directory, the exports of these
+        # scans get the node in their file name
+        counts = Counter(name for names in self._map(lambda node: {scan['name'] for scan in node.list_scans()})
+                         for name in names)
+        return {name for name, count in counts.items() if count > 1}
+
+    def run_scans(self, scan_ids: dict[str, list[int]], **scheduler_options) -> dict[str, dict[int, str]]:
+        # one ScanScheduler per node, all running at once. scan ids and results are keyed by server
+        shared_names = set()
+        if scheduler_options.get('export_dir'):
+            os.makedirs(scheduler_options['export_dir'], mode=0o755, exist_ok=True)
+            shared_names = self.shared_names()
+        def run(node: NessusAPI) -> dict[int, str]:
+            if not scan_ids.get(node.server):
+                return {}
+            scheduler = ScanScheduler(node, manifest_name=manifest_name(node), shared_names=shared_names, **scheduler_options)
+            return scheduler.run(scan_ids[node.server])
+        return {node.server: results for node, results in zip(self.nodes, self._map(run))}
+
+    def export_all_scans(self, outdir: str, **export_options) -> list[tuple]:
+        # every node exports into outdir at once; returns the failures of all nodes
+        os.makedirs(outdir, mode=0o755, exist_ok=True)
+        folder_name = export_options.get('scan_folder')
+        present = self.has_folder(folder_name) if folder_name else [True] * len(self.nodes)
+        shared_names = self.shared_names()
+        failures = self._map(lambda node, here: node.export_all_scans(outdir, manifest_name=manifest_name(node),
+                                                                      shared_names=shared_names, **export_options)
+                             if here else [], present)
+        return [failure for node_failures in failures for failure in node_failures]
@@ -0,0 +1,87 @@
+import json
+import re
+from functools import wraps
+from math import ceil, log2
+from threading import Lock
+from time import perf_counter, time
+from typing import Callable
+
+class Profiler():
+    # Records count, total/max latency, a log2 latency histogram (in ms) and bytes transferred for
+    # every instrumented call. Nothing is patched until instrument_class()/instrument_session() is
+    # called, so an unprofiled run pays no overhead.
+    def __init__(self) -> None:
+        self.started = time()
+        self.stats = {}
+        self.events = []
+        self._lock = Lock()
+
+    def record(self, name: str, start: float, seconds: float, nbytes: int = 0) -> None:
+        bucket = f"<={2 ** max(0, ceil(log2(max(seconds * 1000, 1))))}ms"
+        with self._lock:
+            stat = self.stats.setdefault(name, {'count': 0, 'total': 0.0, 'max': 0.0, 'bytes': 0, 'histogram': {}})
+            stat['count'] += 1
+            stat['total'] += seconds
+            stat['max'] = max(stat['max'], seconds)
+            stat['bytes'] += nbytes
+            stat['histogram'][bucket] = stat['histogram'].get(bucket, 0) + 1
+            self.events.append({'name': name, 'start': round(start - self.started, 6),
+                                'seconds': round(seconds, 6), 'bytes': nbytes})
+
+    def wrap(self, name: str, fn: Callable) -> Callable:
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            start = time()
+            began = perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                self.record(name, start, perf_counter() - began)
+        return wrapper
+
+    def instrument_class(self, cls: type) -> None:
+        # time every method defined on the class, for all instances
+        for attr, value in list(vars(cls).items()):
+            if callable(value) and not attr.startswith('__'):
+                setattr(cls, attr, self.wrap(f"{cls.__name__}.{attr.split('__')[-1]}", value))
+
+    def instrument_session(self, session) -> None:
+        # time every HTTP request made through a requests.Session, grouped by method and path with
+        # ids replaced, counting request and response body bytes (uploads included)
+        request = session.request
+
+        @wraps(request)
+        def timed_request(method, url, *args, **kwargs):
+            start = time()
+            began = perf_counter()
+            response = None
+            try:
+                response = request(method, url, *args, **kwargs)
+                return response
+            finally:
+                path = re.sub(r'/\d+', '/{id}', re.sub(r'^https?://[^/]+', '', url).split('?')[0])
+                # the encoded body as sent (json, form data and multipart file uploads alike); a request
+                # that failed before a response only counts its json/data
+                body = response.request.body if response is not None else kwargs.get('data')
+                nbytes = len(body) if isinstance(body, (bytes, str)) else 0
+                if response is None and kwargs.get('json') is not None:
+                    nbytes += len(json.dumps(kwargs['json']))
+                if response is not None:
+                    nbytes += int(response.headers.get('Content-Length') or 0)
+                self.record(f"HTTP {method.upper()} {path}", start, perf_counter() - began, nbytes)
+        session.request = timed_request
+
+    def summary(self, top: int = 15) -> str:
+        with self._lock:
+            stats = sorted(self.stats.items(), key=lambda item: item[1]['total'], reverse=True)[:top]
+        lines = [f"{'call':<48} {'count':>7} {'total s':>9} {'mean ms':>9} {'max ms':>9} {'KB':>10}"]
+        for name, stat in stats:
+            lines.append(f"{name[:48]:<48} {stat['count']:>7} {stat['total']:>9.3f} "
+                         f"{stat['total'] / stat['count'] * 1000:>9.1f} {stat['max'] * 1000:>9.1f} {stat['bytes'] / 1024:>10.1f}")
+        return '\n'.join(lines)
+
+    def write(self, path: str) -> None:
+        with self._lock:
+            trace = {'started': self.started, 'seconds': time() - self.started, 'stats': self.stats, 'events': self.events}
+            with open(path, 'w', encoding='utf-8') as file:
+                file.write(json.dumps(trace, indent=2))
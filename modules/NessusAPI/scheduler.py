@@ -0,0 +1,103 @@
+from concurrent.futures import ThreadPoolExecutor
+from time import sleep
+from typing import Optional
+from nessusapi import NessusAPI, ACTIVE_STATUSES
+from manifest import ExportManifest, MANIFEST_NAME, export_names
+
+# statuses a launched scan can end in
+FINISHED_STATUSES = ('completed', 'canceled', 'aborted', 'imported')
+# a paused scan holds no slot and only resumes by hand, the scheduler stops waiting for it
+PAUSED_STATUSES = ('paused',)
+
+class ScanScheduler():
+    # Launches queued scans while keeping at most `max_running` scans active on the scanner (scans
+    # started outside the scheduler count too). Status is read with one scans.list() call per poll; the
+    # poll interval doubles up to `max_interval` while nothing changes and drops back to `min_interval`
+    # as soon as a scan finishes, so the next queued scan starts right after a slot frees.
+    def __init__(self,
+                 nessus: NessusAPI,
+                 max_running: int = 2,
+                 min_interval: float = 5,
+                 max_interval: float = 120,
+                 export_dir: Optional[str] = None,
+                 export_formats: list[str] = ['nessus'],
+                 manifest_name: str = MANIFEST_NAME,
+                 shared_names: set[str] = frozenset()) -> None:
+        self.nessus = nessus
+        self.max_running = max(1, max_running)
+        self.min_interval = min_interval
+        self.max_interval = max(min_interval, max_interval)
+        self.export_dir = export_dir
+        self.export_formats = export_formats
+        self.manifest_name = manifest_name
+        # scan names other pool nodes export into the same export_dir
+        self.shared_names = shared_names
+
+    def _poll(self) -> tuple[int, dict[int, dict]]:
+        # server timestamp and scans by id; launch times use the server clock to compare with
+        # last_modification_date
+        listing = self.nessus.Nessus.scans.list()
+        return listing['timestamp'], {scan['id']: scan for scan in listing['scans'] or []}
+
+    def _export(self, scan: dict, scans: dict[int, dict]) -> None:
+        # exports run one scan at a time in the background so polling is never blocked by a download.
+        # scans is the poll the scan finished in, file names depend on the other scans' names
+        failures = self.nessus.export_scans([scan], self.export_dir, self.export_formats,
+                                            manifest=ExportManifest(self.export_dir, self.manifest_name),
+                                            names=export_names(list(scans.values()), self.nessus.server, self.shared_names))
+        for _, fmt, _, error in failures:
+            print(f"Export of '{scan['name']}' ({fmt}) failed: {error}")
+
+    def run(self, scan_ids: list[int]) -> dict[int, str]:
+        # returns the final status of every scheduled scan
+        queue = list(dict.fromkeys(scan_ids))
+        launched = {} # scan id -> launch time
+        finished = {}
+        interval = self.min_interval
+        exports = {} # export future -> scan name
+        with ThreadPoolExecutor(max_workers=1) as exporter:
+            while queue or launched:
+                timestamp, scans = self._poll()
+                changed = False
+                for scan_id, started in list(launched.items()):
+                    scan = scans.get(scan_id)
+                    if not scan:
+                        finished[scan_id] = 'deleted'
+                    elif scan['status'] in FINISHED_STATUSES + PAUSED_STATUSES and scan['last_modification_date'] >= started:
+                        finished[scan_id] = scan['status']
+                        print(f"Scan '{scan['name']}' {scan['status']}")
+                        if self.export_dir and scan['status'] == 'completed':
+                            exports[exporter.submit(self._export, scan, scans)] = scan['name']
+                    else:
+                        continue
+                    del launched[scan_id]
+                    changed = True
+
+                active = len([scan for scan in scans.values() if scan['status'] in ACTIVE_STATUSES])
+                # a just-launched scan may not be reported as active yet
+                active = max(active, len(launched))
+                while queue and active < self.max_running:
+                    scan_id = queue.pop(0)
+                    if scan_id not in scans:
+                        print(f"Scan {scan_id} no longer exists, skipping")
+                        finished[scan_id] = 'deleted'
+                        continue
+                    try:
+                        self.nessus.Nessus.scans.launch(scan_id)
+                    except Exception as e:
+                        print(f"FAILED to launch '{scans[scan_id]['name']}': {e}")
+                        finished[scan_id] = 'failed'
+                        continue
+                    launched[scan_id] = timestamp
+                    active += 1
+                    changed = True
+                    print(f"Launched '{scans[scan_id]['name']}' ({len(queue)} queued)")
+
+                if not (queue or launched):
+                    break
+                interval = self.min_interval if changed else min(interval * 2, self.max_interval)
+                sleep(interval)
+        for future, name in exports.items():
+            if future.exception():
+                print(f"Export of '{name}' failed: {future.exception()}")
+        return finished
@@ -0,0 +1,87 @@
+import os
+import shlex
+import tarfile
+from collections import defaultdict
+from io import BytesIO
+from subprocess import SubprocessError, run
+from typing import Container
+from jobs import JobGraph
+
+# SSH public key credentials whose private_key is "host:/path" are fetched from that host before the
+# policies are imported. Keys are grouped by source host and login so each host is contacted once
+# (one ssh session streaming a tar of every key it holds), and kept in memory until they are uploaded.
+
+PUBLIC_KEY_AUTH = ('public key', 'public_key')
+
+class KeyCollectionError(OSError):
+    def __init__(self, errors: dict[str, str]) -> None:
+        self.errors = errors
+        super().__init__('; '.join(f"{key}: {error}" for key, error in errors.items()))
+
+def remote_keys(policies: list[dict], skip: Container[str] = ()) -> dict[tuple[str, str, str], set[str]]:
+    # (host, username, login password) -> remote key paths used by the policies' SSH credentials
+    sources = defaultdict(set)
+    for policy in policies:
+        for ssh_creds in (policy.get('credentials') or {}).get('Host', {}).get('SSH', []):
+            if ssh_creds.get('auth_method') in PUBLIC_KEY_AUTH and ':' in ssh_creds.get('private_key', '') \
+                    and ssh_creds['private_key'] not in skip:
+                host, path = ssh_creds['private_key'].split(':', 1)
+                sources[(host, ssh_creds['username'], ssh_creds.get('password', ''))].add(path)
+    return sources
+
+def fetch_keys(host: str, username: str, password: str, paths: set[str]) -> tuple[dict[str, bytes], dict[str, str]]:
+    # returns the keys read and an error per key that could not be read, both keyed by "host:/path"
+    command = ['ssh', '-q', '-o', 'StrictHostKeyChecking=no', '-o', 'ConnectTimeout=15']
+    env = None
+    if password:
+        # sshpass reads the password from $SSHPASS so it never shows up in the process list
+        command = ['sshpass', '-e', *command]
+        env = {**os.environ, 'SSHPASS': password}
+    else:
+        command += ['-o', 'BatchMode=yes']
+    # a quoted ~ is not expanded, "~/path" becomes "$HOME"/path. $HOME is printed on the line before the
+    # tar stream so the archive's (absolute) names can be matched to the paths in the config
+    quoted = [f'"$HOME"/{shlex.quote(path[2:])}' if path.startswith('~/') else shlex.quote(path) for path in sorted(paths)]
+    remote = f"echo \"$HOME\"; tar -cf - -- {' '.join(quoted)}"
+    try:
+        result = run([*command, f"{username}@{host}", remote], capture_output=True, env=env, timeout=120)
+    except (OSError, ValueError, SubprocessError) as e:
+        return {}, {f"{host}:{path}": str(e) for path in paths}
+
+    home, _, stream = result.stdout.partition(b'\n')
+    home = home.decode(errors='replace')
+    resolved = {path: '/' + (home + path[1:] if path.startswith('~/') else path).lstrip('/') for path in paths}
+    keys = {}
+    try:
+        with tarfile.open(fileobj=BytesIO(stream)) as archive:
+            for member in archive.getmembers():
+                if member.isfile():
+                    keys['/' + member.name.lstrip('/')] = archive.extractfile(member).read()
+    except tarfile.TarError:
+        pass
+    stderr = result.stderr.decode(errors='replace').strip().splitlines()
+    found = {path: keys[resolved[path]] for path in paths if resolved[path] in keys}
+    errors = {}
+    for path in paths - found.keys():
+        # tar names the key it could not read, anything else (auth, network) applies to every key
+        reason = [line for line in stderr if resolved[path] in line] or stderr or [f"ssh exited with status {result.returncode}"]
+        errors[f"{host}:{path}"] = ' '.join(reason)
+    return {f"{host}:{path}": key for path, key in found.items()}, errors
+
+def collect_keys(policies: list[dict], workers: int = 4, skip: Container[str] = ()) -> tuple[dict[str, bytes], dict[str, str]]:
+    # fetch every remote key of the policies (except those in skip) concurrently, one job per source
+    # host and login. returns keys and errors both keyed by the "host:/path" string used in the config
+    graph = JobGraph(workers)
+    job_keys = {}
+    for n, ((host, username, password), paths) in enumerate(remote_keys(policies, skip).items()):
+        job = f"{n}:{username}@{host}"
+        graph.add(job, fetch_keys, host, username, password, paths)
+        job_keys[job] = [f"{host}:{path}" for path in paths]
+    keys, errors = {}, {}
+    for job, error in graph.run().items():
+        # a job that failed outright fails each of its keys with its error
+        errors.update(dict.fromkeys(job_keys[job], str(error)))
+    for found, failed in graph.results.values():
+        keys.update(found)
+        errors.update(failed)
+    return keys, errors
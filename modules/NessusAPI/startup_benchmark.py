@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+
+import argparse
+import os
+import sys
+from statistics import median
+from subprocess import run, DEVNULL
+from time import perf_counter
+
+# Measures how long the CLI tools take to start (and exit) for commands that never talk to Nessus,
+# and fails when the median run is over budget. Frozen builds from freeze.sh are measured too when
+# they exist.
+
+SRC_DIR = os.path.dirname(os.path.abspath(__file__))
+
+COMMANDS = {
+    'nessus-configure --help': [sys.executable, os.path.join(SRC_DIR, 'nessus-configure.py'), '--help'],
+    'nessus-configure (bad args)': [sys.executable, os.path.join(SRC_DIR, 'nessus-configure.py'), 'export', '--bogus'],
+    'nessus-policy-update --help': [sys.executable, os.path.join(SRC_DIR, 'nessus-policy-update.py'), '--help'],
+}
+
+def frozen_commands(dist_dir: str) -> dict[str, list[str]]:
+    commands = {}
+    for tool in ('nessus-configure', 'nessus-policy-update'):
+        for path in (os.path.join(dist_dir, tool), os.path.join(dist_dir, tool, tool)):
+            if os.path.isfile(path) and os.access(path, os.X_OK):
+                commands[f"{tool} --help (frozen)"] = [path, '--help']
+                break
+    return commands
+
+def time_command(command: list[str], runs: int) -> list[float]:
+    timings = []
+    for _ in range(runs):
+        start = perf_counter()
+        run(command, stdout=DEVNULL, stderr=DEVNULL)
+        timings.append(perf_counter() - start)
+    return timings
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Check the startup time of the NessusAPI command-line tools")
+    parser.add_argument('-n', '--runs', metavar="N", type=int, default=10, help='Runs per command (default=10)')
+    parser.add_argument('-b', '--budget', metavar="SECONDS", type=float, default=0.25, help='Maximum median seconds per command (default=0.25)')
+    parser.add_argument('--frozen-budget', metavar="SECONDS", type=float, default=0.75, help='Maximum median seconds per frozen command (default=0.75)')
+    parser.add_argument('--dist', metavar="DIST_DIR", default=os.path.join(SRC_DIR, 'dist'), help='Directory of frozen builds (default=./dist)')
+    args = parser.parse_args()
+
+    over_budget = []
+    commands = {**COMMANDS, **frozen_commands(args.dist)}
+    print(f"{'command':<40} {'median s':>9} {'max s':>9} {'budget':>7}")
+    for name, command in commands.items():
+        budget = args.frozen_budget if 'frozen' in name else args.budget
+        timings = time_command(command, args.runs)
+        print(f"{name:<40} {median(timings):>9.3f} {max(timings):>9.3f} {budget:>7.2f}")
+        if median(timings) > budget:
+            over_budget.append(name)
+
+    if over_budget:
+        print(f"Over budget: {', '.join(over_budget)}")
+        sys.exit(1)
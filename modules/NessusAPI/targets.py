@@ -0,0 +1,185 @@
+from bisect import bisect_right
+from socket import AF_INET, AF_INET6, inet_ntop, inet_pton
+from typing import Iterable, Union
+
+# Scan targets as sorted, merged address intervals per IP version plus the hostnames that can't be
+# resolved to addresses here. Accepts what Nessus accepts in text_targets: addresses, CIDRs (also
+# with a netmask, 10.0.0.0/255.255.255.0), full ranges (10.0.0.1-10.0.0.9) and last-octet ranges
+# (10.0.0.1-9). Duplicates and overlaps disappear on
+# merge, and text() renders each interval as an address, a CIDR or a range, whichever is shortest.
+# Addresses are plain ints converted with inet_pton/inet_ntop, ipaddress objects are far too slow
+# for target lists in the 100k range.
+
+VERSIONS = (4, 6)
+FAMILIES = {4: (AF_INET, 32), 6: (AF_INET6, 128)}
+
+def _address(text: str) -> tuple[int, int]:
+    # (version, address)
+    try:
+        return 4, int.from_bytes(inet_pton(AF_INET, text), 'big')
+    except OSError:
+        pass
+    try:
+        return 6, int.from_bytes(inet_pton(AF_INET6, text.strip().strip('[]')), 'big')
+    except OSError:
+        raise ValueError(f"Invalid address: '{text}'") from None
+
+def _format(version: int, address: int) -> str:
+    family, bits = FAMILIES[version]
+    return inet_ntop(family, address.to_bytes(bits // 8, 'big'))
+
+def parse_target(target: str) -> Union[tuple[int, int, int], str]:
+    # (version, first, last) for address targets, the lowercased name for anything else
+    target = target.strip()
+    try:
+        if '/' in target:
+            start, prefix = target.split('/', 1)
+            version, first = _address(start)
+            bits = FAMILIES[version][1]
+            if version == 4 and '.' in prefix:
+                # netmask notation, only contiguous masks describe a network
+                _, mask = _address(prefix)
+                host_bits = (~mask & 0xffffffff).bit_length()
+                if mask != (0xffffffff >> host_bits) << host_bits:
+                    raise ValueError(f"Invalid netmask: '{target}'")
+                prefix = str(bits - host_bits)
+            if not prefix.isdigit() or int(prefix) > bits:
+                raise ValueError(f"Invalid prefix length: '{target}'")
+            host_mask = (1 << (bits - int(prefix))) - 1
+            return version, first & ~host_mask, first | host_mask
+        if '-' in target:
+            start, end = target.split('-', 1)
+            version, first = _address(start.strip())
+            if version == 4 and end.strip().isdigit():
+                last_version, last = _address(f"{start.rsplit('.', 1)[0]}.{end.strip()}")
+            else:
+                last_version, last = _address(end.strip())
+            if version != last_version or last < first:
+                raise ValueError(f"Invalid target range: '{target}'")
+            return version, first, last
+        version, address = _address(target)
+        return version, address, address
+    except ValueError:
+        # a bad range or CIDR of addresses is an error, anything else that isn't an address is a name
+        try:
+            _address(target.replace('-', '/').split('/')[0])
+        except ValueError:
+            return target.lower()
+        raise ValueError(f"Invalid target: '{target}'")
+
+def merge(intervals: list[tuple[int, int]]) -> list[tuple[int, int]]:
+    if not intervals:
+        return []
+    intervals = sorted(intervals)
+    merged = []
+    start, end = intervals[0]
+    for first, last in intervals:
+        if first > end + 1:
+            merged.append((start, end))
+            start, end = first, last
+        elif last > end:
+            end = last
+    merged.append((start, end))
+    return merged
+
+class TargetSet():
+    def __init__(self, targets: Iterable[str] = ()) -> None:
+        intervals = {version: [] for version in VERSIONS}
+        self.hostnames = {}
+        for entry in targets:
+            # config targets may also hold several comma/newline separated targets in one string
+            for target in entry.replace('\n', ',').split(','):
+                if not target.strip():
+                    continue
+                parsed = parse_target(target)
+                if isinstance(parsed, str):
+                    self.hostnames.setdefault(parsed, None)
+                else:
+                    intervals[parsed[0]].append(parsed[1:])
+        self.intervals = {version: merge(intervals[version]) for version in VERSIONS}
+
+    @classmethod
+    def _from_parts(cls, intervals: dict[int, list[tuple[int, int]]], hostnames: Iterable[str]) -> 'TargetSet':
+        targets = cls()
+        targets.intervals = intervals
+        targets.hostnames = dict.fromkeys(hostnames)
+        return targets
+
+    def __len__(self) -> int:
+        # hosts covered (network and broadcast addresses of a CIDR included, as Nessus counts them)
+        return sum(last - first + 1 for version in VERSIONS for first, last in self.intervals[version]) + len(self.hostnames)
+
+    def __bool__(self) -> bool:
+        return any(self.intervals.values()) or bool(self.hostnames)
+
+    def __contains__(self, target: str) -> bool:
+        parsed = parse_target(target)
+        if isinstance(parsed, str):
+            return parsed in self.hostnames
+        version, first, last = parsed
+        intervals = self.intervals[version]
+        i = bisect_right(intervals, (first, float('inf'))) - 1
+        return i >= 0 and intervals[i][0] <= first and last <= intervals[i][1]
+
+    @staticmethod
+    def _render(version: int, first: int, last: int) -> str:
+        if first == last:
+            return _format(version, first)
+        size = last - first + 1
+        if size & (size - 1) == 0 and first % size == 0:
+            return f"{_format(version, first)}/{FAMILIES[version][1] - size.bit_length() + 1}"
+        return f"{_format(version, first)}-{_format(version, last)}"
+
+    def targets(self) -> list[str]:
+        return [self._render(version, first, last) for version in VERSIONS
+                for first, last in self.intervals[version]] + list(self.hostnames)
+
+    def text(self) -> str:
+        # Nessus text_targets
+        return ', '.join(self.targets())
+
+    def shard(self, count: int) -> list['TargetSet']:
+        # split into at most count non-empty sets of (nearly) equal host counts, in address order,
+        # cutting intervals where needed. hostnames count as one host each and go last
+        total = len(self)
+        count = max(1, min(count, total))
+        quotas = [total // count + (1 if n < total % count else 0) for n in range(count)]
+        shards = []
+        intervals, hostnames, remaining = {version: [] for version in VERSIONS}, [], quotas.pop(0)
+
+        def close() -> None:
+            nonlocal intervals, hostnames, remaining
+            shards.append(self._from_parts(intervals, hostnames))
+            intervals, hostnames = {version: [] for version in VERSIONS}, []
+            remaining = quotas.pop(0) if quotas else 0
+
+        for version in VERSIONS:
+            for first, last in self.intervals[version]:
+                while first <= last:
+                    take = min(remaining, last - first + 1)
+                    intervals[version].append((first, first + take - 1))
+                    first += take
+                    remaining -= take
+                    if not remaining and quotas:
+                        close()
+        for hostname in self.hostnames:
+            hostnames.append(hostname)
+            remaining -= 1
+            if not remaining and quotas:
+                close()
+        if any(intervals.values()) or hostnames:
+            close()
+        return shards
+
+def shard_scans(scans: list[dict]) -> list[dict]:
+    # expand config scans with "shards": N into N scans named "<name> [i/N]" splitting the targets
+    expanded = []
+    for scan in scans:
+        shards = TargetSet(scan['targets']).shard(scan['shards']) if (scan.get('shards') or 1) > 1 else []
+        if len(shards) <= 1:
+            expanded.append({k: v for k, v in scan.items() if k != 'shards'})
+            continue
+        for n, shard in enumerate(shards, 1):
+            expanded.append({**{k: v for k, v in scan.items() if k != 'shards'},
+                             'name': f"{scan['name']} [{n}/{len(shards)}]", 'targets': shard.targets()})
+    return expanded
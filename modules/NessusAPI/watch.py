@@ -0,0 +1,101 @@
+import json
+import sys
+from collections import Counter
+from datetime import datetime
+from time import sleep
+from typing import Optional, TextIO
+from nessusapi import NessusAPI, ACTIVE_STATUSES
+
+# Keeps the status of every scan (or one folder's scans) current with as little traffic as possible.
+# After one full listing, each poll only asks for scans modified since the previous poll's server
+# timestamp (the scans list last_modification_date filter). The filter can't report deleted scans,
+# so a full listing is taken again every `resync` polls. State changes become JSON events:
+#   {"time": <server time>, "server": "host:port", "event": "added" | "changed" | "removed",
+#    "id": ..., "name": ..., "folder": ..., "status": ..., "previous": <previous status>}
+
+class ScanWatcher():
+    def __init__(self, nessus: NessusAPI, folder_name: Optional[str] = None, resync: int = 30) -> None:
+        self.nessus = nessus
+        self.folder_id = None
+        if folder_name:
+            folder = nessus._metadata_index('folders').get(folder_name)
+            if not folder:
+                raise KeyError(f"Folder not found: '{folder_name}'")
+            self.folder_id = folder['id']
+        self.resync = max(1, resync)
+        self.scans = {}
+        self.folders = {}
+        self.timestamp = None
+        self.polls = 0
+        self.last_changed = 0
+
+    def _event(self, event: str, scan: dict, previous: Optional[str] = None) -> dict:
+        return {'time': self.timestamp, 'server': self.nessus.server, 'event': event, 'id': scan['id'],
+                'name': scan['name'], 'folder': self.folders.get(scan['folder_id']), 'status': scan['status'],
+                'previous': previous}
+
+    def poll(self) -> list[dict]:
+        full = self.timestamp is None or self.polls % self.resync == 0
+        # the filter is compared against whole seconds, overlap by one so a change made in the same
+        # second as the last poll is not missed (a scan seen twice without a change is no event)
+        since = None if full else self.timestamp - 1
+        listing = self.nessus.Nessus.scans.list(folder_id=self.folder_id, last_modification_date=since)
+        self.polls += 1
+        self.timestamp = listing['timestamp']
+        self.folders = {folder['id']: folder['name'] for folder in listing['folders'] or []}
+        scans = listing['scans'] or []
+        self.last_changed = len(scans)
+
+        events = []
+        for scan in scans:
+            old = self.scans.get(scan['id'])
+            self.scans[scan['id']] = scan
+            if not old:
+                events.append(self._event('added', scan))
+            elif old['status'] != scan['status']:
+                events.append(self._event('changed', scan, old['status']))
+        if full:
+            live = {scan['id'] for scan in scans}
+            for scan_id in [i for i in self.scans if i not in live]:
+                events.append(self._event('removed', self.scans.pop(scan_id)))
+        return events
+
+def render(watchers: list[ScanWatcher]) -> str:
+    # status table of all watched scans, active scans first
+    rows = [(watcher, scan) for watcher in watchers for scan in watcher.scans.values()]
+    rows.sort(key=lambda row: (row[1]['status'] not in ACTIVE_STATUSES, row[0].folders.get(row[1]['folder_id']) or '', row[1]['name']))
+    counts = Counter(scan['status'] for _, scan in rows)
+    lines = [f"{datetime.now():%Y-%m-%d %H:%M:%S}  {len(rows)} scan(s): "
+             + ', '.join(f"{count} {status}" for status, count in counts.most_common())]
+    lines.append(f"{'server':<22} {'folder':<20} {'scan':<40} {'status':<11} {'modified':<19}")
+    for watcher, scan in rows:
+        modified = datetime.fromtimestamp(scan['last_modification_date']).strftime('%Y-%m-%d %H:%M:%S')
+        lines.append(f"{watcher.nessus.server[:22]:<22} {(watcher.folders.get(scan['folder_id']) or '')[:20]:<20} "
+                     f"{scan['name'][:40]:<40} {scan['status']:<11} {modified}")
+    lines.append(f"last poll: {sum(watcher.last_changed for watcher in watchers)} scan(s) transferred")
+    return '\n'.join(lines)
+
+def describe(event: dict) -> str:
+    change = f"{event['previous']} -> {event['status']}" if event['event'] == 'changed' else f"{event['event']} ({event['status']})"
+    return f"{datetime.fromtimestamp(event['time']):%H:%M:%S} {event['server']} [{event['folder']}] {event['name']}: {change}"
+
+def watch(watchers: list[ScanWatcher], interval: float = 10, events: Optional[TextIO] = None,
+          live: Optional[bool] = None, polls: Optional[int] = None) -> None:
+    # poll every `interval` seconds until interrupted (or `polls` times). events are written to `events`
+    # as JSON lines; the terminal shows the redrawn table when live, otherwise one line per event
+    live = sys.stdout.isatty() and events is not sys.stdout if live is None else live
+    n = 0
+    while polls is None or n < polls:
+        n += 1
+        for watcher in watchers:
+            for event in watcher.poll():
+                if events:
+                    events.write(json.dumps(event) + '\n')
+                if not live and events is not sys.stdout:
+                    print(describe(event))
+        if events:
+            events.flush()
+        if live:
+            print(f"\033[H\033[2J{render(watchers)}", flush=True)
+        if polls is None or n < polls:
+            sleep(interval)
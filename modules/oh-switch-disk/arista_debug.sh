@@ -1,6 +1,10 @@
 #!/bin/sh
 
 # This is the main dialog script launched by 'run.sh'
+# the serial work itself is done by osd.py, on every selected switch at once
+
+OSD_DIR="$(dirname "$(readlink -f "$0")")"
+OSD="python3 $OSD_DIR/osd.py --config $OSD_DIR/config.csv --logdir $OSD_DIR/logs"
 
 ############## helper functions ##############
 
@@ -8,24 +12,39 @@
 function execmenu() {
     local returncode=1
     while true; do
-        eval "$args" && break
+        eval "$@" && break
     done
 }
 
 function toast(){
     title="$1"
     message="$2"
-    dialog --msgbox --title="$title"  
+    dialog --title "$title" --msgbox "$message" 10 60
 }
 
 # check if serial cable is plugged in on a port by attempting to grab output
 function checkserial() {
-
+    $OSD check 2>&1 | dialog --title "Serial Consoles" --programbox 20 100
 }
 
 # check if ethernet cable is plugged in on a port by checking dmesg output
 function checkethernet() {
+    dmesg | grep -i "link is up" | tail -n 20 | dialog --title "Ethernet Links" --programbox 20 100
+}
 
+# checklist of the switches in config.csv, sets $switches to osd.py -s arguments
+function selectswitches() {
+    local hostnames selected
+    hostnames=$(tail -n +2 "$OSD_DIR/config.csv" | cut -d, -f2 | tr -d ' ')
+    exec 3>&1
+    selected=$(dialog --ok-label "Next" --cancel-label "Back" --separate-output \
+                --checklist "Switches:" 20 50 15 \
+                $(for hostname in $hostnames; do echo "$hostname - on"; done) \
+            2>&1 1>&3)
+    local status=$?
+    exec 3>&-
+    [ $status -eq 0 ] && [ -n "$selected" ] || return 1
+    switches=$(for hostname in $selected; do printf -- '-s %s ' "$hostname"; done)
 }
 
 ############## Menus ##############
@@ -43,24 +62,25 @@ function mainmenu() {
                 Rebuild   "Reload EOS, Configs, and Keys on a switch" \
                 Debug     "Open a Serial Debug Window" \
             2>&1 1>&3)
+    local status=$?
     exec 3>&-
-    if [ $! -gt 0 ]; then
+    # Exit
+    [ $status -eq 1 ] && exit 0
+    if [ $status -gt 0 ]; then
         toast 'Error' "An Error Occurred. Close this window and try Again."
         exit 1
     fi
 
     previousmenu=mainmenu
     case "$result" in
-        "Clear")
-### TODO: selection for what switch to rebuild if reprovisioning before clear
+        "Downgrade")
             execmenu showclearingoptions
             ;;
         "Rebuild")
-### TODO: selection for what switch to rebuild
             execmenu showprovisioningoptions
             ;;
         "Debug")
-            execmenu 
+            execmenu checkserial
             ;;
         *)
             toast 'Error' "Invalid debug option selected."
@@ -73,6 +93,8 @@ function showprovisioningoptions() {
     # install keys
     # upload configs on serial
     # upload os on serial
+    selectswitches || return 0
+    $OSD $switches provision 2>&1 | dialog --title "Provisioning" --programbox 30 120
 }
 
 function showclearingoptions() {
@@ -87,7 +109,16 @@ function showclearingoptions() {
                 "Show serial debug window" 2 'off' \
                 "Log to file?" 3 'off' \
                 2>&1 1>&3)
+    local status=$?
     exec 3>&-
+    [ $status -eq 0 ] || return 0
+    local options="$result"
+    local logfile=
+    if echo "$options" | grep -q "Log to file"; then
+        logfile="$OSD_DIR/logs/decommission-$(date +%Y%m%d-%H%M%S).log"
+    fi
+    selectswitches || return 0
+    serialclear "$(echo "$options" | grep -c Reprovision)" "$(echo "$options" | grep -c debug)" "$logfile"
 }
 
 ############## Actions ##############
@@ -95,19 +126,37 @@ function showclearingoptions() {
 function serialclear() {
     local reprovision="$1"
     local showdebug="$2"
-    local logfile="$3"
+    # the run summary is kept in logfile when set (the serial output is always in osd.py's per-switch logs)
+    local logfile="${3:-$(mktemp)}"
 
     # reboots into Aboot
     # removes everything
     # runs decom swi
     # opens parallel debug window
     # copies decommission-log out to a result dir and replaces all \r\n lines with ''
-
+    # (osd.py keeps a log per switch in logs/ with the \r already removed)
+    mkdir -p "$(dirname "$logfile")"
+    if [ "$reprovision" -gt 0 ]; then
+        $OSD $switches provision 2>&1 | dialog --title "Provisioning" --programbox 30 120
+    fi
+    if [ "$showdebug" -gt 0 ]; then
+        $OSD $switches decommission 2>&1 | tee "$logfile" | dialog --title "Decommissioning" --programbox 30 120
+    else
+        $OSD $switches decommission > "$logfile" 2>&1
+        toast 'Decommission' "$(tail -n 1 "$logfile")"
+    fi
+    if [ -z "$3" ]; then
+        rm -f "$logfile"
+    fi
 }
 
 
 ############## Main ##############
 
 function main() {
+    while true; do
+        mainmenu
+    done
+}
 
-}
\ No newline at end of file
+main
\ No newline at end of file
@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+
+import argparse
+import os
+import pty
+import re
+import tty
+from threading import Event, Thread
+from time import sleep
+
+# Fake Arista serial consoles on ptys, for trying osd.py without switches. Each switch starts logged in
+# at an enabled EOS prompt and understands just enough of what osd.py sends: "reload now", Ctrl-C at
+# the Aboot banner, and in the Aboot shell heredoc writes, wc -c, image copies from USB, clearing flash,
+# boot <image> (decommission) and reboot (into EOS). Run it with a directory to get a matching
+# config.csv and generated/ configs there, then point osd.py -c at it.
+
+BOOT_LINES = ['', 'Aboot 2.1.0', '', 'Press Control-C now to enter Aboot shell']
+COMMAND = re.compile(r'^(?P<command>.*); echo "OSD-RC=\$\?"$')
+HEREDOC = re.compile(r"^cat > (?P<path>\S+) << '(?P<end>\w+)'$")
+COPY = re.compile(r'^\[ -f (?P<target>\S+) \] \|\| cp (?P<source>\S+) \S+$')
+CLEAR = re.compile(r'^for f in (?P<dir>\S+)/\* .*\[ "\$f" = (?P<keep>\S+) \] \|\| rm -rf "\$f"; done$')
+
+class FakeSwitch():
+    def __init__(self, hostname: str, usb: dict[str, bytes], aboot_window: float = 3, boot_time: float = 1,
+                 decommission_time: float = 1) -> None:
+        self.hostname = hostname
+        self.usb = usb
+        self.flash = {}
+        self.aboot_window = aboot_window
+        self.boot_time = boot_time
+        self.decommission_time = decommission_time
+        self.state = 'eos'
+        self.heredoc = None
+        self.line = ''
+        self.interrupt = Event()
+        self.master, slave = pty.openpty()
+        # the slave stays open so the pty survives while nothing else has it open
+        tty.setraw(slave)
+        self.slave = slave
+        self.port = os.ttyname(slave)
+        Thread(target=self._serve, daemon=True).start()
+
+    def write(self, text: str) -> None:
+        os.write(self.master, text.replace('\n', '\r\n').encode())
+
+    def prompt(self) -> None:
+        self.write({'eos': f"\n{self.hostname}#", 'login': f"\n{self.hostname} login: ", 'aboot': "\nAboot#"}.get(self.state, ''))
+
+    def _serve(self) -> None:
+        while True:
+            for char in os.read(self.master, 1024).decode(errors='replace'):
+                if char == '\x03':
+                    self.interrupt.set()
+                elif char in '\r\n':
+                    self.write('\n')
+                    line, self.line = self.line, ''
+                    self._line(line)
+                elif self.state != 'booting':
+                    self.line += char
+                    self.write(char)
+
+    def _boot(self, aboot: bool = True) -> None:
+        # power on: Aboot banner (Ctrl-C enters the Aboot shell), otherwise EOS boots to its login prompt
+        self.state = 'booting'
+        self.interrupt.clear()
+        if aboot:
+            for line in BOOT_LINES:
+                self.write(f"{line}\n")
+            if self.interrupt.wait(self.aboot_window):
+                self.write("Welcome to Aboot.\n")
+                self.state = 'aboot'
+                self.prompt()
+                return
+        self.write("Booting flash:/EOS.swi\n")
+        sleep(self.boot_time)
+        self.write("Starting EOS\n")
+        self.state = 'login'
+        self.prompt()
+
+    def _decommission(self, image: str) -> None:
+        self.state = 'booting'
+        self.write(f"Booting {image}\n")
+        for n in range(1, 4):
+            sleep(self.decommission_time / 3)
+            self.write(f"Decommission step {n}/3\n")
+        self.write("Decommission complete\n")
+        self.state = 'off'
+
+    def _line(self, line: str) -> None:
+        if self.heredoc:
+            path, end, lines = self.heredoc
+            if line == end:
+                self.flash[path] = ''.join(f"{l}\n" for l in lines).encode()
+                self.heredoc = None
+                self.prompt()
+            else:
+                lines.append(line)
+            return
+        if self.state == 'eos':
+            if line.strip() == 'reload now':
+                Thread(target=self._boot, daemon=True).start()
+                return
+        elif self.state == 'aboot':
+            self._aboot(line.strip())
+            return
+        self.prompt()
+
+    def _aboot(self, line: str) -> None:
+        match = COMMAND.match(line)
+        command = match.group('command') if match else line
+        output, rc = '', 0
+        if HEREDOC.match(command):
+            self.heredoc = (HEREDOC.match(command).group('path'), HEREDOC.match(command).group('end'), [])
+            return
+        elif command == 'reboot':
+            Thread(target=self._boot, args=(False,), daemon=True).start()
+            return
+        elif command.startswith('boot '):
+            image = command.split()[1]
+            if image in self.flash:
+                Thread(target=self._decommission, args=(image,), daemon=True).start()
+                return
+            output, rc = f"boot: {image}: No such file or directory\n", 1
+        elif command.startswith('wc -c < '):
+            path = command.split('< ', 1)[1]
+            if path in self.flash:
+                output = f"{len(self.flash[path])}\n"
+            else:
+                output, rc = f"sh: can't open '{path}': No such file or directory\n", 1
+        elif COPY.match(command):
+            target, source = COPY.match(command).group('target', 'source')
+            name = os.path.basename(source)
+            if target not in self.flash:
+                if name in self.usb:
+                    self.flash[target] = self.usb[name]
+                else:
+                    output, rc = f"cp: can't stat '{source}': No such file or directory\n", 1
+        elif CLEAR.match(command):
+            keep = CLEAR.match(command).group('keep')
+            self.flash = {path: data for path, data in self.flash.items() if path == keep}
+        elif command:
+            output, rc = f"sh: {command.split()[0]}: not found\n", 127
+        self.write(output)
+        if match:
+            self.write(f"OSD-RC={rc}\n")
+        self.prompt()
+
+def write_demo(directory: str, switches: list[FakeSwitch]) -> None:
+    # config.csv for the fake switches plus their configs in generated/
+    os.makedirs(os.path.join(directory, 'generated'), exist_ok=True)
+    with open(os.path.join(directory, 'config.csv'), 'w') as file:
+        file.write("baseline, hostname, zerotouch-config, boot-config, startup-config, console\n")
+        for switch in switches:
+            startup = f"{switch.hostname}-startup-config"
+            with open(os.path.join(directory, 'generated', startup), 'w') as config:
+                config.write(f"hostname {switch.hostname}\n!\n" + ''.join(f"interface Ethernet{n}\n   shutdown\n!\n" for n in range(1, 49)) + "end\n")
+            file.write(f"EOS.swi, {switch.hostname}, zerotouch-config, boot-config, {startup}, {switch.port}\n")
+    with open(os.path.join(directory, 'generated', 'zerotouch-config'), 'w') as config:
+        config.write("DISABLE=True\n")
+    with open(os.path.join(directory, 'generated', 'boot-config'), 'w') as config:
+        config.write("SWI=flash:EOS.swi\n")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Fake Arista switch consoles on ptys for osd.py")
+    parser.add_argument('directory', help='Directory for the generated config.csv and configs')
+    parser.add_argument('-n', '--switches', metavar="COUNT", type=int, default=4, help='Number of switches (default=4)')
+    parser.add_argument('--boot-time', metavar="SECONDS", type=float, default=1, help='Seconds EOS takes to boot (default=1)')
+    args = parser.parse_args()
+    usb = {'EOS.swi': os.urandom(4096), 'decommission.swi': os.urandom(4096)}
+    switches = [FakeSwitch(f"fake-switch-{n}", usb, boot_time=args.boot_time) for n in range(1, args.switches + 1)]
+    write_demo(args.directory, switches)
+    for switch in switches:
+        print(f"{switch.hostname}: {switch.port}")
+    print(f"Run: python3 osd.py -c {os.path.join(args.directory, 'config.csv')} provision")
+    try:
+        while True:
+            sleep(5)
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,296 @@
+#!/usr/bin/env python3
+
+import argparse
+import csv
+import os
+import re
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from threading import Lock
+from time import monotonic, sleep
+from typing import Callable, Optional
+
+# Provisions every switch in config.csv at once over its own serial console (the "console" column).
+# Each switch runs in its own thread with its own console log and state machine:
+#   connect -> reboot -> aboot -> push | decommission -> boot -> done       (any state -> failed)
+# A switch that is logged in and enabled is reloaded with "reload now", otherwise it has to be power
+# cycled by hand; the engine waits for the Aboot banner on every console at once, so a rack takes about
+# as long as its slowest switch. Config files are written to flash with heredocs and verified by size.
+# EOS images are too big to push over a serial line, they are copied from a USB stick (Aboot mounts it
+# at /mnt/usb1) when flash doesn't have them yet.
+
+SRC_DIR = os.path.dirname(os.path.abspath(__file__))
+CONFIG_COLUMNS = ('zerotouch-config', 'boot-config', 'startup-config')
+FLASH = '/mnt/flash'
+USB = '/mnt/usb1'
+HEREDOC_END = 'OSD_EOF'
+
+ABOOT_BANNER = re.compile(rb'Press Control-C now to enter Aboot shell')
+ABOOT_PROMPT = re.compile(rb'Aboot#\s*$')
+EOS_ENABLE_PROMPT = re.compile(rb'[\w.-]+#\s*$')
+EOS_PROMPT = re.compile(rb'[\w.-]+>\s*$')
+LOGIN_PROMPT = re.compile(rb'login:\s*$')
+RETURN_CODE = re.compile(rb'OSD-RC=(\d+)')
+
+def load_switches(path: str, hostnames: Optional[list[str]] = None, resolve: bool = True) -> list[dict]:
+    # rows of config.csv (padded with spaces, trailing commas), with the config files resolved from
+    # generated/ (configs with keys/creds) or baseline/ next to the csv when resolve is set
+    base_dir = os.path.dirname(os.path.abspath(path))
+    switches = []
+    with open(path, newline='', encoding='utf-8') as file:
+        for row in csv.DictReader(file, skipinitialspace=True):
+            switch = {key.strip(): (value or '').strip() for key, value in row.items() if key and key.strip()}
+            if not switch.get('hostname') or (hostnames and switch['hostname'] not in hostnames):
+                continue
+            switch['files'] = {}
+            for column in CONFIG_COLUMNS:
+                if resolve and switch.get(column):
+                    candidates = [os.path.join(base_dir, d, switch[column]) for d in ('generated', 'baseline')]
+                    found = [candidate for candidate in candidates if os.path.isfile(candidate)]
+                    if not found:
+                        raise FileNotFoundError(f"{switch['hostname']}: {column} '{switch[column]}' not found in generated/ or baseline/")
+                    switch['files'][column] = found[0]
+            switches.append(switch)
+    missing = set(hostnames or []) - {switch['hostname'] for switch in switches}
+    if missing:
+        raise KeyError(f"Switches not in {path}: {', '.join(sorted(missing))}")
+    return switches
+
+class Console():
+    # A switch's serial console. Everything read is appended to the log (with \r removed) and kept in a
+    # buffer that expect() consumes up to the end of each match.
+    def __init__(self, port: str, baudrate: int, logfile: str) -> None:
+        import serial
+        self.serial = serial.Serial(port, baudrate=baudrate, timeout=0.1)
+        self.log = open(logfile, 'w', encoding='utf-8')
+        self.buffer = b''
+
+    def close(self) -> None:
+        self.serial.close()
+        self.log.close()
+
+    def read(self) -> bytes:
+        data = self.serial.read(self.serial.in_waiting or 1)
+        if data:
+            self.buffer = (self.buffer + data)[-65536:]
+            self.log.write(data.decode(errors='replace').replace('\r', ''))
+            self.log.flush()
+        return data
+
+    def drain(self) -> None:
+        # drop output already waiting so the next expect() only sees the answer to what is sent next
+        while self.read():
+            pass
+        self.buffer = b''
+
+    def send(self, text: str) -> None:
+        self.serial.write(text.encode())
+        self.serial.flush()
+
+    def expect(self, patterns: list[re.Pattern], timeout: float) -> tuple[int, re.Match]:
+        # index and match of the first pattern found in the output
+        deadline = monotonic() + timeout
+        while True:
+            for i, pattern in enumerate(patterns):
+                match = pattern.search(self.buffer)
+                if match:
+                    self.buffer = self.buffer[match.end():]
+                    return i, match
+            if monotonic() > deadline:
+                raise TimeoutError(f"Timed out after {timeout:.0f}s waiting for {' or '.join(p.pattern.decode() for p in patterns)}")
+            self.read()
+
+    def run(self, command: str, timeout: float = 30) -> tuple[int, str]:
+        # run a command in the Aboot shell, returns its exit status and output
+        self.drain()
+        self.send(f'{command}; echo "OSD-RC=$?"\r')
+        _, match = self.expect([RETURN_CODE], timeout)
+        output = match.string[:match.start()].decode(errors='replace').replace('\r', '')
+        # the first line is the echoed command
+        output = output.split('\n', 1)[1] if '\n' in output else ''
+        self.expect([ABOOT_PROMPT], timeout)
+        return int(match.group(1)), output.strip()
+
+class SwitchProvisioner():
+    def __init__(self, switch: dict, action: str, options: argparse.Namespace,
+                 report: Callable[['SwitchProvisioner'], None]) -> None:
+        self.switch = switch
+        self.hostname = switch['hostname']
+        self.action = action
+        self.options = options
+        self.report = report
+        self.state = 'pending'
+        self.detail = ''
+        self.error = None
+        self.started = None
+        self.finished = None
+        self.logfile = os.path.join(options.logdir, f"{self.hostname}-{action}-{datetime.now():%Y%m%d-%H%M%S}.log")
+
+    def set_state(self, state: str, detail: str = '') -> None:
+        self.state = state
+        self.detail = detail
+        self.report(self)
+
+    def run(self) -> 'SwitchProvisioner':
+        self.started = monotonic()
+        console = None
+        try:
+            if not self.switch.get('console'):
+                raise KeyError("No console set in config.csv")
+            self.set_state('connect', self.switch['console'])
+            console = Console(self.switch['console'], self.options.baud, self.logfile)
+            at = self.probe(console)
+            if self.action == 'check':
+                self.set_state('done', at)
+                return self
+            if at != 'aboot':
+                self.reboot(console, at)
+                self.enter_aboot(console)
+            if self.action == 'provision':
+                self.push(console)
+                self.boot(console)
+            else:
+                self.decommission(console)
+            self.set_state('done')
+        except Exception as e:
+            self.error = e
+            self.set_state('failed', str(e))
+        finally:
+            self.finished = monotonic()
+            if console:
+                console.close()
+        return self
+
+    def probe(self, console: Console) -> str:
+        # where the switch is: aboot, enabled (EOS #), eos (EOS >), login or no response
+        console.drain()
+        console.send('\r')
+        try:
+            i, _ = console.expect([ABOOT_PROMPT, EOS_ENABLE_PROMPT, EOS_PROMPT, LOGIN_PROMPT], self.options.prompt_timeout)
+        except TimeoutError:
+            return 'no response'
+        return ('aboot', 'enabled', 'eos', 'login')[i]
+
+    def reboot(self, console: Console, at: str) -> None:
+        if at == 'enabled':
+            self.set_state('reboot', 'reload now')
+            console.send('reload now\r')
+        else:
+            self.set_state('reboot', f"at {at}, power cycle the switch")
+
+    def enter_aboot(self, console: Console) -> None:
+        console.expect([ABOOT_BANNER], self.options.boot_timeout)
+        console.send('\x03')
+        console.expect([ABOOT_PROMPT], self.options.prompt_timeout)
+        self.set_state('aboot')
+
+    def copy_image(self, console: Console, image: str) -> None:
+        # put an EOS image on flash from the USB stick unless it is already there
+        self.set_state(self.state, f"image {image}")
+        rc, output = console.run(f'[ -f {FLASH}/{image} ] || cp {USB}/{image} {FLASH}/{image}', self.options.copy_timeout)
+        if rc:
+            raise FileNotFoundError(f"{image} is not on flash or {USB}: {output}")
+
+    def write_file(self, console: Console, path: str, content: bytes) -> None:
+        # heredoc line by line, paced so the console's input buffer never overflows
+        text = content.decode().replace('\r\n', '\n')
+        if not text.endswith('\n'):
+            text += '\n'
+        if f"\n{HEREDOC_END}\n" in f"\n{text}":
+            raise ValueError(f"{path} contains the heredoc delimiter line '{HEREDOC_END}'")
+        console.drain()
+        console.send(f"cat > {path} << '{HEREDOC_END}'\r")
+        for line in text.splitlines():
+            console.send(f"{line}\r")
+            sleep(self.options.line_delay)
+            console.read()
+        console.send(f"{HEREDOC_END}\r")
+        console.expect([ABOOT_PROMPT], self.options.prompt_timeout)
+        rc, output = console.run(f"wc -c < {path}")
+        size = output.split()[-1] if output.split() else ''
+        if rc or size != str(len(text.encode())):
+            raise IOError(f"Writing {path} failed: {len(text.encode())} bytes sent, flash has {size or output}")
+
+    def push(self, console: Console) -> None:
+        self.set_state('push')
+        baseline = self.switch.get('baseline', '')
+        if baseline.endswith('.swi'):
+            self.copy_image(console, baseline)
+        for column, path in self.switch['files'].items():
+            self.set_state('push', column)
+            with open(path, 'rb') as file:
+                self.write_file(console, f"{FLASH}/{column}", file.read())
+
+    def boot(self, console: Console) -> None:
+        self.set_state('boot')
+        console.send('reboot\r')
+        if self.options.no_wait:
+            return
+        console.expect([LOGIN_PROMPT], self.options.ready_timeout)
+
+    def decommission(self, console: Console) -> None:
+        # clear flash except the decommission image and boot it; its output ends up in the switch log
+        image = self.options.image
+        self.set_state('decommission', 'clearing flash')
+        rc, output = console.run(f'for f in {FLASH}/* {FLASH}/.[!.]*; do [ "$f" = {FLASH}/{image} ] || rm -rf "$f"; done')
+        if rc:
+            raise IOError(f"Clearing flash failed: {output}")
+        self.copy_image(console, image)
+        self.set_state('decommission', f"booting {image}")
+        console.send(f"boot {FLASH}/{image}\r")
+        console.expect([re.compile(self.options.done_pattern.encode())], self.options.ready_timeout)
+
+class Reporter():
+    # one line per state change, serialized across switch threads
+    def __init__(self) -> None:
+        self.lock = Lock()
+
+    def __call__(self, provisioner: SwitchProvisioner) -> None:
+        with self.lock:
+            detail = f": {provisioner.detail}" if provisioner.detail else ''
+            print(f"{datetime.now():%H:%M:%S} [{provisioner.hostname}] {provisioner.state}{detail}", flush=True)
+
+def run_all(switches: list[dict], action: str, options: argparse.Namespace) -> list[SwitchProvisioner]:
+    os.makedirs(options.logdir, exist_ok=True)
+    report = Reporter()
+    provisioners = [SwitchProvisioner(switch, action, options, report) for switch in switches]
+    with ThreadPoolExecutor(max_workers=max(1, len(provisioners))) as pool:
+        list(pool.map(SwitchProvisioner.run, provisioners))
+    return provisioners
+
+def parse_args(argv: Optional[list[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Provision or decommission Arista switches over their serial consoles, all at once")
+    parser.add_argument('-c', '--config', metavar="CSV", default=os.path.join(SRC_DIR, 'config.csv'), help='Switch config (default=./config.csv)')
+    parser.add_argument('-s', '--switch', metavar="HOSTNAME", action='append', help='Only this switch, repeat for several (default=all)')
+    parser.add_argument('-l', '--logdir', metavar="DIR", default=os.path.join(SRC_DIR, 'logs'), help='Directory for the per-switch console logs (default=./logs)')
+    parser.add_argument('-b', '--baud', metavar="RATE", type=int, default=9600, help='Console baud rate (default=9600)')
+    parser.add_argument('--prompt-timeout', metavar="SECONDS", type=float, default=10, help='Seconds to wait for a shell prompt (default=10)')
+    parser.add_argument('--boot-timeout', metavar="SECONDS", type=float, default=900, help='Seconds to wait for the Aboot banner after a reload/power cycle (default=900)')
+    parser.add_argument('--ready-timeout', metavar="SECONDS", type=float, default=1800, help='Seconds to wait for EOS to boot or the decommission to finish (default=1800)')
+    parser.add_argument('--copy-timeout', metavar="SECONDS", type=float, default=600, help='Seconds to wait for an image copy from USB (default=600)')
+    parser.add_argument('--line-delay', metavar="SECONDS", type=float, default=0.02, help='Pause after each config line sent (default=0.02)')
+
+    subparser = parser.add_subparsers(title='Commands', dest='command', required=True)
+    subparser.add_parser('check', description='Check which switch consoles answer and where each switch is (Aboot, EOS, login)')
+    provision_parser = subparser.add_parser('provision', description='Reboot into Aboot, write the configs (and baseline image from USB) to flash and boot EOS')
+    provision_parser.add_argument('--no-wait', action='store_true', help="Don't wait for EOS to finish booting")
+    decommission_parser = subparser.add_parser('decommission', description='Reboot into Aboot, clear flash and boot the decommission image')
+    decommission_parser.add_argument('--image', metavar="SWI", default='decommission.swi', help='Decommission image on flash or the USB stick (default=decommission.swi)')
+    decommission_parser.add_argument('--done-pattern', metavar="REGEX", default=r'(?i)decommission(ing)? (complete|finished)', help='Console output that marks a finished decommission')
+    return parser.parse_args(argv)
+
+if __name__ == '__main__':
+    args = parse_args()
+    try:
+        switches = load_switches(args.config, args.switch, resolve=args.command == 'provision')
+    except (OSError, KeyError) as e:
+        print(f"ERROR: {e}")
+        sys.exit(2)
+    start = monotonic()
+    provisioners = run_all(switches, args.command, args)
+    print(f"\n{'switch':<20} {'result':<8} {'seconds':>8}  log")
+    for p in provisioners:
+        print(f"{p.hostname:<20} {'FAILED' if p.error else p.detail or 'ok':<8} {p.finished - p.started:>8.1f}  {p.logfile}")
+    print(f"{len([p for p in provisioners if not p.error])}/{len(provisioners)} switch(es) {args.command} ok in {monotonic() - start:.1f}s")
+    sys.exit(1 if any(p.error for p in provisioners) else 0)
@@ -1,7 +1,7 @@
 #!/bin/sh
 
 # this script launches the debugging tool in a new xfce terminal
-xfce4-terminal --command='/opt/oh-switch-disk/arista-debug.sh' \
+xfce4-terminal --command='/opt/OSD/arista_debug.sh' \
     --title="\"Oh-Switch-Disk\" Debugging Tool (Arista)" \
     --geometry 120x40+10+10
     --fullscreen
\ No newline at end of file